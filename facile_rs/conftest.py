@@ -0,0 +1,109 @@
+import json
+import threading
+
+import pytest
+import requests
+
+from facile_rs.utils.cache import (
+    Cache,
+    HttpCache,
+    PageIndex,
+    PandocCache,
+    set_cache,
+    set_http_cache,
+    set_page_index,
+    set_pandoc_cache,
+)
+from facile_rs.utils.http import clear_documents, set_session
+
+
+class MockResponse:
+
+    """A response of MockSession, the body is given as JSON data or as text"""
+
+    def __init__(self, data=None, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = data if isinstance(data, str) else json.dumps(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} Error: {self.text}', response=self)
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, chunk_size):
+        content = self.text.encode()
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+
+class MockSession:
+
+    """A session which records all requests and gets the responses from a handler.
+
+    The handler is called with the method, the URL and the keyword arguments of each request and returns
+    the data of the response, or a tuple (data, status_code) or (data, status_code, headers).
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.requests.append((method, url, kwargs))
+
+        response = self.handler(method, url, **kwargs)
+        return MockResponse(*response) if isinstance(response, tuple) else MockResponse(response)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+@pytest.fixture
+def mock_session():
+    """Return a function which replaces the shared session by a MockSession with the given handler."""
+    def mock_session(handler):
+        session = MockSession(handler)
+        set_session(session)
+        return session
+
+    yield mock_session
+    set_session(None)
+
+
+@pytest.fixture(autouse=True)
+def caches(tmp_path):
+    """Keep the caches of every test in its own temporary directory, instead of ~/.cache/facile-rs."""
+    cache_path = tmp_path / 'cache'
+    set_cache(Cache(cache_path / 'cache.sqlite3'))
+    set_http_cache(HttpCache(cache_path / 'http.sqlite3'))
+    set_pandoc_cache(PandocCache(cache_path / 'pandoc.sqlite3'))
+    set_page_index(PageIndex(cache_path / 'pages.sqlite3'))
+
+    yield cache_path
+
+    clear_documents()
+    set_cache(None)
+    set_http_cache(None)
+    set_pandoc_cache(None)
+    set_page_index(None)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+"""Convert the CodeMeta metadata of many repositories at once.
+
+Description
+-----------
+
+This script takes a list of CodeMeta metadata files (local paths, glob patterns or URLs) and creates
+the CFF citation file, the DataCite XML and the Zenodo and RADAR payloads for each of them.
+
+The repositories are converted in parallel by a pool of BULK_PROCESSES processes. A failing repository does not
+stop the conversion of the other repositories: the errors are collected in a summary report, which is printed
+and optionally written to REPORT_PATH as JSON. The script exits with an error if any repository failed.
+
+The output for each repository is written to a subdirectory of OUTPUT_PATH, named after the location
+of its CodeMeta file, e.g. ``repos/foo/codemeta.json`` is converted to ``OUTPUT_PATH/repos_foo/``.
+
+Usage
+-----
+
+.. argparse::
+   :module: facile_rs.convert_bulk
+   :func: create_parser
+   :prog: convert_bulk.py
+
+Example usage
+-------------
+
+.. code-block:: bash
+
+    python3 convert_bulk.py 'repos/*/codemeta.json' https://example.org/codemeta.json \\
+        --codemeta-list more_repositories.txt \\
+        --output-path /path/to/output \\
+        --report-path /path/to/report.json
+
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import urlparse
+
+from .utils import cli, settings
+from .utils.concurrency import get_default_processes
+from .utils.metadata import CffMetadata, CodemetaMetadata, DataciteMetadata, RadarMetadata, ZenodoMetadata
+
+logger = logging.getLogger(__file__)
+
+FORMATS = {
+    'cff': 'CITATION.cff',
+    'datacite': 'datacite.xml',
+    'zenodo': 'zenodo.json',
+    'radar': 'radar.json'
+}
+
+
+def create_parser(add_help=True):
+    parser = argparse.ArgumentParser(add_help=add_help)
+    parser.add_argument('codemeta_locations', nargs='*', default=[],
+                        help='Locations of the codemeta.json files, local paths may be glob patterns')
+    parser.add_argument('--codemeta-list', dest='codemeta_list',
+                        help='Path to a file with one CodeMeta location per line')
+    parser.add_argument('--output-path', dest='output_path',
+                        help='Path to the output directory')
+    parser.add_argument('--format', dest='formats', action='append', default=[], choices=list(FORMATS),
+                        help='Output format, can be given several times (default: all formats)')
+    parser.add_argument('--report-path', dest='report_path',
+                        help='Path to the JSON file for the summary report')
+    parser.add_argument('--radar-email', dest='radar_email',
+                        help='Email for the RADAR metadata')
+    parser.add_argument('--radar-backlink', dest='radar_backlink',
+                        help='Backlink for the RADAR metadata')
+    parser.add_argument('--no-sort-authors', dest='sort_authors', action='store_false',
+                        help='Do not sort authors alphabetically, keep order in codemeta.json file')
+    parser.set_defaults(sort_authors=True)
+    parser.add_argument('--bulk-processes', dest='bulk_processes', type=int,
+                        help='Number of processes used to convert the repositories (default: number of CPUs)')
+    cli.add_cache_arguments(parser, lookups=True)
+    cli.add_http_arguments(parser)
+    parser.add_argument('--log-level', dest='log_level',
+                        help='Log level (ERROR, WARN, INFO, or DEBUG)')
+    parser.add_argument('--log-file', dest='log_file',
+                        help='Path to the log file')
+    return parser
+
+
+def get_codemeta_locations(locations, codemeta_list=None):
+    """
+    Expand the glob patterns in the given locations, add the locations from codemeta_list
+    and remove duplicates.
+
+    :param locations: URLs, paths or glob patterns of CodeMeta files
+    :type locations: list
+    :param codemeta_list: path to a file with one location per line, empty lines and lines starting with # are ignored
+    :type codemeta_list: str
+    :return: list of locations, in the given order
+    :rtype: list
+    """
+    locations = list(locations)
+    if codemeta_list:
+        for line in Path(codemeta_list).expanduser().read_text().splitlines():
+            if line.strip() and not line.strip().startswith('#'):
+                locations.append(line.strip())
+
+    codemeta_locations = []
+    for location in locations:
+        if not urlparse(location).scheme and glob.has_magic(location):
+            codemeta_locations += sorted(glob.glob(os.path.expanduser(location), recursive=True))
+        else:
+            codemeta_locations.append(location)
+
+    return list(dict.fromkeys(codemeta_locations))
+
+
+def get_output_name(location):
+    """
+    Get the name of the output directory for a CodeMeta location, from the location without the file name.
+
+    :param location: URL or path of the CodeMeta file
+    :type location: str
+    :return: name of the output directory
+    :rtype: str
+    """
+    parsed_url = urlparse(location)
+    path = parsed_url.netloc + parsed_url.path if parsed_url.scheme else location
+    # remove the empty, . and .. segments, but keep the dots of hidden directories, e.g. ./.config/codemeta.json
+    parts = [part for part in os.path.dirname(path.rstrip('/')).split('/') if part not in ['', '.', '..']]
+    parent = '/'.join(parts)
+    return re.sub(r'[^A-Za-z0-9.-]+', '_', parent).strip('_') or 'codemeta'
+
+
+def init_process(shared_state):
+    """
+    Initialize a worker process with the settings of the main process, which are not inherited
+    if the processes are not forked.
+
+    :param shared_state: settings of the main process
+    :type shared_state: dict
+    """
+    vars(settings).update(shared_state)
+
+
+def convert_codemeta(location, output_path, formats, radar_email=None, radar_backlink=None, sort_authors=True):
+    """
+    Convert one CodeMeta file to the given formats. Errors are returned in the result instead of being raised,
+    so that one failing repository does not stop the others.
+
+    :param location: URL or path of the CodeMeta file
+    :type location: str
+    :param output_path: path to the output directory of this repository
+    :type output_path: pathlib.Path
+    :param formats: output formats, keys of FORMATS
+    :type formats: list
+    :return: result with the keys location, output_path, files, error and duration
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    result = {
+        'location': location,
+        'output_path': str(output_path),
+        'files': [],
+        'error': None
+    }
+
+    try:
+        codemeta = CodemetaMetadata()
+        codemeta.fetch(location)
+        codemeta.compute_names()
+        codemeta.remove_doubles()
+        if sort_authors:
+            codemeta.sort_persons()
+
+        output_path.mkdir(parents=True, exist_ok=True)
+        for metadata_format in formats:
+            if metadata_format == 'cff':
+                content = CffMetadata(codemeta.data).to_yaml()
+            elif metadata_format == 'datacite':
+                content = DataciteMetadata(codemeta.data).to_xml()
+            elif metadata_format == 'zenodo':
+                content = json.dumps(ZenodoMetadata(codemeta.data).as_dict(), indent=2)
+            elif metadata_format == 'radar':
+                radar_dict = RadarMetadata(codemeta.data, radar_email, radar_backlink).as_dict()
+                content = json.dumps(radar_dict, indent=2)
+
+            file_path = output_path / FORMATS[metadata_format]
+            file_path.write_text(content)
+            result['files'].append(str(file_path))
+
+    except Exception as e:
+        logger.error('%s: %s', location, e)
+        result['error'] = f'{e.__class__.__name__}: {e}'
+
+    result['duration'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def main():
+    parser = create_parser()
+
+    settings.setup(parser, validate=[
+        'OUTPUT_PATH'
+    ])
+
+    locations = get_codemeta_locations(settings.CODEMETA_LOCATIONS, settings.CODEMETA_LIST)
+    if not locations:
+        parser.error('No CodeMeta locations were given.')
+
+    formats = settings.FORMATS or list(FORMATS)
+    processes = int(settings.BULK_PROCESSES) if settings.BULK_PROCESSES else get_default_processes()
+    output_path = Path(settings.OUTPUT_PATH).expanduser()
+
+    # give each repository its own output directory, even if the names are the same
+    output_paths = []
+    for location in locations:
+        name = base_name = get_output_name(location)
+        i = 1
+        while output_path / name in output_paths:
+            i += 1
+            name = f'{base_name}-{i}'
+        output_paths.append(output_path / name)
+
+    start = time.perf_counter()
+    arguments = (formats, settings.RADAR_EMAIL, settings.RADAR_BACKLINK, settings.SORT_AUTHORS)
+    if processes > 1 and len(locations) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(locations)),
+                                 initializer=init_process, initargs=(dict(vars(settings)), )) as executor:
+            futures = [executor.submit(convert_codemeta, location, path, *arguments)
+                       for location, path in zip(locations, output_paths)]
+
+        results = []
+        for location, path, future in zip(locations, output_paths, futures):
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as e:
+                # a worker process died, e.g. killed by the OOM killer, which fails the repositories it had not
+                # finished yet, but not the ones which were already converted
+                logger.error('%s: %s', location, e)
+                results.append({
+                    'location': location,
+                    'output_path': str(path),
+                    'files': [],
+                    'error': f'{e.__class__.__name__}: {e}',
+                    'duration': None
+                })
+    else:
+        results = [convert_codemeta(location, path, *arguments) for location, path in zip(locations, output_paths)]
+
+    failed = [result for result in results if result['error']]
+    report = {
+        'total': len(results),
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'duration': round(time.perf_counter() - start, 3),
+        'results': results
+    }
+
+    if settings.REPORT_PATH:
+        Path(settings.REPORT_PATH).expanduser().write_text(json.dumps(report, indent=2))
+
+    print('Converted {succeeded} of {total} repositories in {duration} s.'.format(**report))
+    for result in failed:
+        print('{location}: {error}'.format(**result))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
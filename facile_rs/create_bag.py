@@ -7,6 +7,8 @@ Description
 
 This script creates a BagIt bag using the bagit-python package.
 The assets to be included in the bag are given as positional arguments.
+The payload files are hashed in parallel by BAG_PROCESSES processes (by default one per available CPU).
+With HASH_ON_FETCH, the checksums are instead computed while the assets are fetched, so that they are read only once.
 
 Usage
 -----
@@ -21,9 +23,8 @@ Usage
 import argparse
 from pathlib import Path
 
-import bagit
-
 from .utils import cli, settings
+from .utils.bag import BAG_STAGING_STRATEGIES, CHECKSUM_ALGORITHMS, make_bag
 from .utils.http import fetch_dict, fetch_files
 
 
@@ -36,6 +37,13 @@ def create_parser(add_help=True):
                         help='Path to the Bag directory')
     parser.add_argument('--bag-info-location', dest='bag_info_locations', action='append', default=[],
                         help='Locations of the bag-info YAML/JSON files')
+    parser.add_argument('--bag-processes', '--processes', dest='bag_processes', type=int,
+                        help='Number of processes used to hash the payload files (default: number of CPUs)')
+    parser.add_argument('--hash-on-fetch', dest='hash_on_fetch', action='store_true',
+                        help='Compute the checksums of the assets while fetching them, instead of reading them again')
+    cli.add_fetch_arguments(parser, BAG_STAGING_STRATEGIES)
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -51,14 +59,21 @@ def main():
         'BAG_PATH'
     ])
 
+    # the staging strategy might come from the environment, which is not checked by the parser
+    if settings.STAGING_STRATEGY and settings.STAGING_STRATEGY not in BAG_STAGING_STRATEGIES:
+        parser.error('STAGING_STRATEGY needs to be one of {}.'.format(', '.join(BAG_STAGING_STRATEGIES)))
+
     # setup the bag
     bag_path = Path(settings.BAG_PATH).expanduser()
     if bag_path.exists():
         parser.error(f'{bag_path} already exists.')
     bag_path.mkdir()
 
-    # collect assets
-    fetch_files(settings.ASSETS, bag_path)
+    # collect assets, computing the checksums on the fly if requested
+    checksums = fetch_files(settings.ASSETS, bag_path, workers=settings.FETCH_WORKERS,
+                            chunk_size=settings.FETCH_CHUNK_SIZE,
+                            algorithms=CHECKSUM_ALGORITHMS if settings.HASH_ON_FETCH else None,
+                            strategy=settings.STAGING_STRATEGY)
 
     # fetch bag-info
     bag_info = {}
@@ -66,7 +81,8 @@ def main():
         bag_info.update(fetch_dict(location))
 
     # create bag using bagit
-    bag = bagit.make_bag(bag_path, bag_info)
+    bag = make_bag(bag_path, bag_info, processes=settings.BAG_PROCESSES,
+                   checksums=checksums if settings.HASH_ON_FETCH else None)
     bag.save()
 
 
@@ -8,6 +8,8 @@ Description
 This script creates a BagIt bag using the bagit-python package, but also includes a DataCite XML file
 as recommended by the RDA Research Data Repository Interoperability WG.
 The assets to be included in the bag are given as positional arguments.
+The payload files are hashed in parallel by BAG_PROCESSES processes (by default one per available CPU).
+With HASH_ON_FETCH, the checksums are instead computed while the assets are fetched, so that they are read only once.
 
 Usage
 -----
@@ -22,10 +24,9 @@ Usage
 import argparse
 from pathlib import Path
 
-import bagit
-
 from .utils import cli, settings
-from .utils.checksum import get_sha256, get_sha512
+from .utils.bag import BAG_STAGING_STRATEGIES, CHECKSUM_ALGORITHMS, make_bag
+from .utils.checksum import get_checksums
 from .utils.http import fetch_dict, fetch_files
 
 
@@ -40,6 +41,13 @@ def create_parser(add_help=True):
                         help='Locations of the bag-info YAML/JSON files')
     parser.add_argument('--datacite-path', dest='datacite_path',
                         help='Path to the DataCite XML file')
+    parser.add_argument('--bag-processes', '--processes', dest='bag_processes', type=int,
+                        help='Number of processes used to hash the payload files (default: number of CPUs)')
+    parser.add_argument('--hash-on-fetch', dest='hash_on_fetch', action='store_true',
+                        help='Compute the checksums of the assets while fetching them, instead of reading them again')
+    cli.add_fetch_arguments(parser, BAG_STAGING_STRATEGIES)
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -56,14 +64,21 @@ def main():
         'DATACITE_PATH'
     ])
 
+    # the staging strategy might come from the environment, which is not checked by the parser
+    if settings.STAGING_STRATEGY and settings.STAGING_STRATEGY not in BAG_STAGING_STRATEGIES:
+        parser.error('STAGING_STRATEGY needs to be one of {}.'.format(', '.join(BAG_STAGING_STRATEGIES)))
+
     # setup the bag
     bag_path = Path(settings.BAG_PATH).expanduser()
     if bag_path.exists():
         parser.error(f'{bag_path} already exists.')
     bag_path.mkdir()
 
-    # collect assets
-    fetch_files(settings.ASSETS, bag_path)
+    # collect assets, computing the checksums on the fly if requested
+    checksums = fetch_files(settings.ASSETS, bag_path, workers=settings.FETCH_WORKERS,
+                            chunk_size=settings.FETCH_CHUNK_SIZE,
+                            algorithms=CHECKSUM_ALGORITHMS if settings.HASH_ON_FETCH else None,
+                            strategy=settings.STAGING_STRATEGY)
 
     # fetch bag-info
     bag_info = {}
@@ -71,7 +86,8 @@ def main():
         bag_info.update(fetch_dict(location))
 
     # create bag using bagit
-    bag = bagit.make_bag(bag_path, bag_info)
+    bag = make_bag(bag_path, bag_info, processes=settings.BAG_PROCESSES,
+                   checksums=checksums if settings.HASH_ON_FETCH else None)
     bag.save()
 
     # get datacite.xml and put it in the bag
@@ -81,11 +97,11 @@ def main():
     datacite_bag_path.parent.mkdir()
     datacite_bag_path.write_text(datacite_xml)
 
-    with open(bag_path / 'tagmanifest-sha256.txt', 'a') as f:
-        f.write(f'{get_sha256(datacite_path)} metadata/datacite.xml\n')
-
-    with open(bag_path / 'tagmanifest-sha512.txt', 'a') as f:
-        f.write(f'{get_sha512(datacite_path)} metadata/datacite.xml\n')
+    # add datacite.xml to the tag manifests, computing all checksums in one pass
+    checksums = get_checksums(datacite_bag_path, bag.algorithms)
+    for algorithm, checksum in checksums.items():
+        with open(bag_path / f'tagmanifest-{algorithm}.txt', 'a') as f:
+            f.write(f'{checksum} metadata/datacite.xml\n')
 
 
 def main_deprecated():
@@ -39,6 +39,8 @@ def create_parser(add_help=True):
     parser.add_argument('--no-sort-authors', dest='sort_authors', action='store_false',
                         help='Do not sort authors alphabetically, keep order in codemeta.json file')
     parser.set_defaults(sort_authors=True)
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
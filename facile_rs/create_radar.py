@@ -25,9 +25,9 @@ import smtplib
 from pathlib import Path
 
 from .utils import cli, settings
-from .utils.http import fetch_files
+from .utils.http import STAGING_STRATEGIES, fetch_files
 from .utils.metadata import CodemetaMetadata, RadarMetadata
-from .utils.radar import create_radar_dataset, fetch_radar_token, update_radar_dataset, upload_radar_assets
+from .utils.radar import create_radar_dataset, update_radar_dataset, upload_radar_assets, with_radar_token
 
 
 def create_parser(add_help=True):
@@ -59,16 +59,25 @@ def create_parser(add_help=True):
                         help='Workspace ID for the RADAR service.')
     parser.add_argument('--radar-redirect-url', dest='radar_redirect_url',
                         help='Redirect URL for the OAuth workflow of the RADAR service.')
+    parser.add_argument('--radar-token-cache', dest='radar_token_cache',
+                        help='Path to a file where RADAR tokens are cached until they expire.')
     parser.add_argument('--radar-email', dest='radar_email',
                         help='Email for the RADAR metadata.')
     parser.add_argument('--radar-backlink', dest='radar_backlink',
                         help='Backlink for the RADAR metadata.')
+    parser.add_argument('--upload-workers', dest='upload_workers', type=int,
+                        help='Maximum number of assets uploaded to RADAR at the same time (default: 4)')
+    parser.add_argument('--upload-retries', dest='upload_retries', type=int,
+                        help='Number of retries for each asset uploaded to RADAR (default: 3)')
     parser.add_argument('--smtp-server', dest='smtp_server',
                         help='SMTP server used to inform about new release. No mail sent if empty.')
     parser.add_argument('--notification-email', dest='notification_email',
                         help='Recipient address to inform about new release. No mail sent if empty.')
     parser.add_argument('--dry', action='store_true',
                         help='Perform a dry run, do not upload anything.')
+    cli.add_fetch_arguments(parser, STAGING_STRATEGIES)
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -102,8 +111,8 @@ def main():
     # prepare radar payload
     codemeta = CodemetaMetadata()
     codemeta.fetch(settings.CODEMETA_LOCATION)
-    codemeta.fetch_authors(settings.CREATORS_LOCATIONS)
-    codemeta.fetch_contributors(settings.CONTRIBUTORS_LOCATIONS)
+    codemeta.fetch_authors(settings.CREATORS_LOCATIONS, workers=settings.FETCH_WORKERS)
+    codemeta.fetch_contributors(settings.CONTRIBUTORS_LOCATIONS, workers=settings.FETCH_WORKERS)
     codemeta.compute_names()
     codemeta.remove_doubles()
     if settings.SORT_AUTHORS:
@@ -120,21 +129,27 @@ def main():
     radar_dict = radar_metadata.as_dict()
 
     # collect assets
-    fetch_files(settings.ASSETS, radar_path)
+    fetch_files(settings.ASSETS, radar_path, workers=settings.FETCH_WORKERS,
+                chunk_size=settings.FETCH_CHUNK_SIZE,
+                strategy=settings.STAGING_STRATEGY)
 
     if not settings.DRY:
-        # obtain oauth token
-        headers = fetch_radar_token(settings.RADAR_URL, settings.RADAR_CLIENT_ID, settings.RADAR_CLIENT_SECRET,
-                                    settings.RADAR_REDIRECT_URL, settings.RADAR_USERNAME, settings.RADAR_PASSWORD)
-
         # update or create radar dataset
-        if radar_dict.get('id'):
-            dataset_id = update_radar_dataset(settings.RADAR_URL, radar_dict.get('id'), headers, radar_dict)
-        else:
-            dataset_id = create_radar_dataset(settings.RADAR_URL, settings.RADAR_WORKSPACE_ID, headers, radar_dict)
+        def update_or_create_radar_dataset(headers):
+            if radar_dict.get('id'):
+                return update_radar_dataset(settings.RADAR_URL, radar_dict.get('id'), headers, radar_dict)
+            else:
+                return create_radar_dataset(settings.RADAR_URL, settings.RADAR_WORKSPACE_ID, headers, radar_dict)
+
+        # obtain oauth token, a new one is fetched if the cached token is rejected
+        dataset_id, headers = with_radar_token(update_or_create_radar_dataset, settings.RADAR_URL,
+                                               settings.RADAR_CLIENT_ID, settings.RADAR_CLIENT_SECRET,
+                                               settings.RADAR_REDIRECT_URL, settings.RADAR_USERNAME,
+                                               settings.RADAR_PASSWORD, cache_path=settings.RADAR_TOKEN_CACHE)
 
         # upload assets
-        upload_radar_assets(settings.RADAR_URL, dataset_id, headers, settings.ASSETS, radar_path)
+        upload_radar_assets(settings.RADAR_URL, dataset_id, headers, settings.ASSETS, radar_path,
+                            workers=settings.UPLOAD_WORKERS, retries=settings.UPLOAD_RETRIES)
 
     if settings.SMTP_SERVER and settings.NOTIFICATION_EMAIL:
         message = """\
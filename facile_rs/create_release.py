@@ -21,9 +21,8 @@ Usage
 import argparse
 import logging
 
-import requests
-
 from .utils import cli, settings
+from .utils.http import get_session
 
 logger = logging.getLogger(__file__)
 
@@ -43,6 +42,8 @@ def create_parser(add_help=True):
                         help='The PRIVATE_TOKEN to be used with the GitLab API.')
     parser.add_argument('--dry', action='store_true',
                         help='Perform a dry run, do not perform the final request.')
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -84,7 +85,7 @@ def main():
         print(release_json)
     else:
         logging.debug('release_json = %s', release_json)
-        response = requests.post(settings.RELEASE_API_URL, headers={
+        response = get_session().post(settings.RELEASE_API_URL, headers={
             'Content-Type': 'application/json',
             'Private-Token': settings.PRIVATE_TOKEN
         }, json=release_json)
@@ -9,6 +9,7 @@ This script creates an archive in Zenodo and uploads the assets provided as posi
 The metadata is created similar to create_datacite.
 
 If the Zenodo ID is already present in the CodeMeta file, the existing Zenodo archive is updated instead.
+In this case, only the assets which are not yet in the archive or which have changed are uploaded.
 
 Usage
 -----
@@ -25,7 +26,7 @@ import smtplib
 from pathlib import Path
 
 from .utils import cli, settings
-from .utils.http import fetch_files
+from .utils.http import STAGING_STRATEGIES, fetch_files
 from .utils.metadata import CodemetaMetadata, ZenodoMetadata
 from .utils.zenodo import create_zenodo_dataset, update_zenodo_dataset, upload_zenodo_assets
 
@@ -49,12 +50,17 @@ def create_parser(add_help=True):
                         help='URL of the Zenodo service. Test environment available at https://sandbox.zenodo.org')
     parser.add_argument('--zenodo-token', dest='zenodo_token',
                         help='Zenodo personal token.')
+    parser.add_argument('--upload-workers', dest='upload_workers', type=int,
+                        help='Maximum number of assets uploaded to Zenodo at the same time (default: 4)')
     parser.add_argument('--smtp-server', dest='smtp_server',
                         help='SMTP server used to inform about new release. No mail sent if empty.')
     parser.add_argument('--notification-email', dest='notification_email',
                         help='Recipient address to inform about new release. No mail sent if empty.')
     parser.add_argument('--dry', action='store_true',
                         help='Perform a dry run, do not upload anything.')
+    cli.add_fetch_arguments(parser, STAGING_STRATEGIES)
+    cli.add_cache_arguments(parser, lookups=True)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -81,8 +87,8 @@ def main():
     # prepare Zenodo payload
     codemeta = CodemetaMetadata()
     codemeta.fetch(settings.CODEMETA_LOCATION)
-    codemeta.fetch_authors(settings.CREATORS_LOCATIONS)
-    codemeta.fetch_contributors(settings.CONTRIBUTORS_LOCATIONS)
+    codemeta.fetch_authors(settings.CREATORS_LOCATIONS, workers=settings.FETCH_WORKERS)
+    codemeta.fetch_contributors(settings.CONTRIBUTORS_LOCATIONS, workers=settings.FETCH_WORKERS)
     codemeta.compute_names()
     codemeta.remove_doubles()
     if settings.SORT_AUTHORS:
@@ -95,7 +101,9 @@ def main():
     zenodo_dict = zenodo_metadata.as_dict()
 
     # collect assets
-    fetch_files(settings.ASSETS, zenodo_path)
+    fetch_files(settings.ASSETS, zenodo_path, workers=settings.FETCH_WORKERS,
+                chunk_size=settings.FETCH_CHUNK_SIZE,
+                strategy=settings.STAGING_STRATEGY)
 
     if not settings.DRY:
         # update or create Zenodo dataset
@@ -113,7 +121,8 @@ def main():
             dataset_id = create_zenodo_dataset(settings.ZENODO_URL, settings.ZENODO_TOKEN, zenodo_dict)
 
         # upload assets
-        upload_zenodo_assets(settings.ZENODO_URL, dataset_id, settings.ZENODO_TOKEN, settings.ASSETS, zenodo_path)
+        upload_zenodo_assets(settings.ZENODO_URL, dataset_id, settings.ZENODO_TOKEN, settings.ASSETS, zenodo_path,
+                             workers=settings.UPLOAD_WORKERS)
 
         if settings.SMTP_SERVER and settings.NOTIFICATION_EMAIL:
             message = """\
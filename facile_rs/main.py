@@ -33,8 +33,8 @@ from .utils import cli
 
 
 def main():
-    # Create the command-line parser
-    parser = cli.create_parser()
+    # Create the command-line parser, only the script of the selected command is imported
+    parser = cli.create_parser(command=tuple(sys.argv[1:3]))
     args = parser.parse_args()
     # Print help if subcommand is missing
     subcommand = args.subcommand
@@ -54,8 +54,9 @@ def main():
                 break
         sys.exit(1)
     # Call the script with the remaining arguments
-    command_str = ' '.join(sys.argv[:3])
-    sys.argv = [command_str] + sys.argv[3:]
+    command_depth = 1 + args.command_depth
+    command_str = ' '.join(sys.argv[:command_depth])
+    sys.argv = [command_str] + sys.argv[command_depth:]
     func()
 
 if __name__ == "__main__":
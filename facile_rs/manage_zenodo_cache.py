@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""Manage the cache of Zenodo vocabulary lookups.
+
+Description
+-----------
+
+This script clears or warms the persistent cache used for the lookups of licenses, awards and funders
+in the Zenodo API, which are performed when CodeMeta metadata is converted to Zenodo metadata.
+
+The cache is stored in CACHE_DIR (default: ``~/.cache/facile-rs``) and its entries expire after CACHE_TTL seconds.
+To warm the cache, the licenses and fundings of the CodeMeta file given by CODEMETA_LOCATION are resolved.
+
+Usage
+-----
+
+.. argparse::
+    :module: facile_rs.manage_zenodo_cache
+    :func: create_parser
+    :prog: manage_zenodo_cache.py
+
+"""
+
+import argparse
+
+from .utils import cli, settings
+from .utils.cache import get_cache
+from .utils.metadata import CodemetaMetadata, ZenodoMetadata
+
+
+def create_parser(add_help=True):
+    parser = argparse.ArgumentParser(add_help=add_help)
+    parser.add_argument('--clear', action='store_true',
+                        help='Remove all Zenodo lookups from the cache.')
+    parser.add_argument('--warm', action='store_true',
+                        help='Resolve the licenses and fundings of the CodeMeta file and store them in the cache.')
+    parser.add_argument('--codemeta-location', dest='codemeta_location',
+                        help='Location of the main codemeta.json JSON file')
+    cli.add_cache_arguments(parser, lookups=True)
+    cli.add_http_arguments(parser)
+    parser.add_argument('--log-level', dest='log_level',
+                        help='Log level (ERROR, WARN, INFO, or DEBUG)')
+    parser.add_argument('--log-file', dest='log_file',
+                        help='Path to the log file')
+    return parser
+
+
+def main():
+    parser = create_parser()
+
+    settings.setup(parser)
+
+    if not (settings.CLEAR or settings.WARM):
+        parser.error('Use --clear and/or --warm.')
+    if settings.WARM and not settings.CODEMETA_LOCATION:
+        parser.error('CODEMETA_LOCATION is missing.')
+
+    cache = get_cache()
+
+    if settings.CLEAR:
+        count = cache.clear('zenodo:')
+        print(f'Removed {count} entries from {cache.path}.')
+
+    if settings.WARM:
+        codemeta = CodemetaMetadata()
+        codemeta.fetch(settings.CODEMETA_LOCATION)
+
+        # converting the metadata performs all lookups, which are then stored in the cache
+        ZenodoMetadata(codemeta.data).as_dict()
+        print(f'Stored Zenodo lookups for {settings.CODEMETA_LOCATION} in {cache.path}.')
+
+
+if __name__ == "__main__":
+    main()
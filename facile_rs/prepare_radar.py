@@ -24,7 +24,7 @@ from pathlib import Path
 
 from .utils import cli, settings
 from .utils.metadata import CodemetaMetadata, RadarMetadata
-from .utils.radar import create_radar_dataset, fetch_radar_token, prepare_radar_dataset
+from .utils.radar import create_radar_dataset, prepare_radar_dataset, with_radar_token
 
 
 def create_parser(add_help=True):
@@ -45,12 +45,16 @@ def create_parser(add_help=True):
                         help='Workspace ID for the RADAR service.')
     parser.add_argument('--radar-redirect-url', dest='radar_redirect_url',
                         help='Redirect URL for the OAuth workflow of the RADAR service.')
+    parser.add_argument('--radar-token-cache', dest='radar_token_cache',
+                        help='Path to a file where RADAR tokens are cached until they expire.')
     parser.add_argument('--radar-email', dest='radar_email',
                         help='Email for the RADAR metadata.')
     parser.add_argument('--radar-backlink', dest='radar_backlink',
                         help='Backlink for the RADAR metadata.')
     parser.add_argument('--dry', action='store_true',
                         help='Perform a dry run, do not upload anything.')
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -85,12 +89,12 @@ def main():
     radar_dict = radar_metadata.as_dict()
 
     if not settings.DRY:
-        # obtain oauth token
-        headers = fetch_radar_token(settings.RADAR_URL, settings.RADAR_CLIENT_ID, settings.RADAR_CLIENT_SECRET,
-                                    settings.RADAR_REDIRECT_URL, settings.RADAR_USERNAME, settings.RADAR_PASSWORD)
-
-        # create radar dataset
-        dataset_id = create_radar_dataset(settings.RADAR_URL, settings.RADAR_WORKSPACE_ID, headers, radar_dict)
+        # obtain oauth token and create radar dataset, a new token is fetched if the cached token is rejected
+        dataset_id, headers = with_radar_token(
+            lambda headers: create_radar_dataset(settings.RADAR_URL, settings.RADAR_WORKSPACE_ID, headers, radar_dict),
+            settings.RADAR_URL, settings.RADAR_CLIENT_ID, settings.RADAR_CLIENT_SECRET, settings.RADAR_REDIRECT_URL,
+            settings.RADAR_USERNAME, settings.RADAR_PASSWORD, cache_path=settings.RADAR_TOKEN_CACHE
+        )
         dataset = prepare_radar_dataset(settings.RADAR_URL, dataset_id, headers)
 
         doi = dataset.get('descriptiveMetadata', {}).get('identifier', {}).get('value')
@@ -31,6 +31,8 @@ def create_parser(add_help=True):
                         help='Version of the resource')
     parser.add_argument('--date', dest='date',
                         help='Date for dateModified (format: \'%%Y-%%m-%%d\')')
+    cli.add_cache_arguments(parser)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
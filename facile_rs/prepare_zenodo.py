@@ -37,6 +37,8 @@ def create_parser(add_help=True):
                         help='Zenodo personal token.')
     parser.add_argument('--dry', action='store_true',
                         help='Perform a dry run, do not upload anything.')
+    cli.add_cache_arguments(parser, lookups=True)
+    cli.add_http_arguments(parser)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -24,10 +24,10 @@ import logging
 from pathlib import Path
 
 import frontmatter
-import pypandoc
 
 from .utils import cli, settings
-from .utils.grav import collect_pages
+from .utils.grav import collect_pages, report_pages, write_page
+from .utils.pandoc import convert_text
 
 logger = logging.getLogger(__file__)
 
@@ -49,6 +49,7 @@ def create_parser(add_help=True):
                         help='Path to the source directory for the pipeline.')
     parser.add_argument('--pipeline-csl', dest='pipeline_csl',
                         help='Path to the source directory for the pipeline.')
+    cli.add_cache_arguments(parser, http=False, pandoc=True)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -66,19 +67,22 @@ def main():
     ])
 
     # loop over the found pages and write the content into the files
+    written = []
     for page_path, page, source in collect_pages(settings.GRAV_PATH, settings.PIPELINE):
         source_path = Path(settings.PIPELINE_SOURCE).expanduser() / source
         logger.debug('page_path = %s, source_path = %s', page_path, source_path)
 
         extra_args = [f'--bibliography={source_path}', '--citeproc', '--wrap=preserve']
+        files = [source_path]
         if settings.PIPELINE_CSL:
             extra_args.append(f'--csl={settings.PIPELINE_CSL}')
+            files.append(settings.PIPELINE_CSL)
 
-        page.content = pypandoc.convert_text(TEMPLATE, to='html', format='md',
-                                             extra_args=extra_args)
+        page.content = convert_text(TEMPLATE, to='html', format='md', extra_args=extra_args, files=files)
 
-        logger.info('writing publications to %s', page_path)
-        open(page_path, 'w').write(frontmatter.dumps(page))
+        written.append(write_page(page_path, frontmatter.dumps(page)))
+
+    report_pages(written)
 
 
 def main_deprecated():
@@ -31,6 +31,7 @@ Usage
 
 import argparse
 import ast
+import filecmp
 import logging
 import os
 import re
@@ -38,13 +39,13 @@ import shutil
 from pathlib import Path
 
 import frontmatter
-import pypandoc
 import yaml
 from PIL import Image
 from resizeimage import resizeimage
 
 from .utils import cli, settings
-from .utils.grav import collect_pages
+from .utils.grav import collect_pages, report_pages, write_page
+from .utils.pandoc import convert_texts
 
 logger = logging.getLogger(__file__)
 
@@ -55,6 +56,11 @@ REF_PATTERN = r'\:ref\:\`(.+?)\s\<(.+?)\>\`'
 METADATA_PATTERN = r'__(.*)__ = [\']([^\']*)[\']'
 METADATA_RUN_PATTERN = r'EXAMPLE_(.*) = [\']([^\']*)[\']'
 
+# we should probably add '--shift-heading-level-by=1' to extra_args but it doesn't
+# seem to be supported by our pandoc version
+PANDOC_EXTRA_ARGS = ['--mathjax', '--wrap=preserve']
+PANDOC_OPTIONS = {'html_math_method': 'mathjax', 'wrap_text': 'preserve'}
+
 
 def create_parser(add_help=True):
     parser = argparse.ArgumentParser(add_help=add_help)
@@ -75,6 +81,12 @@ def create_parser(add_help=True):
                         help='Path to the refs yaml file.')
     parser.add_argument('--output-html', action='store_true',
                         help='Output HTML files instead of markdown')
+    parser.add_argument('--pipeline-workers', dest='pipeline_workers', type=int,
+                        help='Number of docstrings converted at the same time (default: number of CPUs)')
+    parser.add_argument('--pandoc-batch-size', dest='pandoc_batch_size', type=int,
+                        help='Number of docstrings converted by one pandoc process, requires pandoc 3.1.1 '
+                             '(default: one process per docstring)')
+    cli.add_cache_arguments(parser, http=False, pandoc=True)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -82,6 +94,211 @@ def create_parser(add_help=True):
     return parser
 
 
+def read_experiment(root, files, refs, images_path=None, output_html=False):
+    """
+    Read one directory of the source tree. The docstring is prepared for the conversion with pandoc,
+    which is done by read_experiments.
+
+    :param root: path to the directory
+    :type root: str
+    :param files: names of the files in the directory
+    :type files: list
+    :param refs: replacements for the :ref: targets in the docstrings
+    :type refs: dict
+    :param images_path: path to the images directory
+    :type images_path: pathlib.Path
+    :param output_html: if True, the content is prepared for HTML output
+    :type output_html: bool
+    :return: experiment as a dictionary, None if the directory contains neither run.py nor __init__.py
+    :rtype: dict
+    """
+    root_path = Path(root)
+    run_path = root_path / 'run.py'
+    init_path = root_path / '__init__.py'
+
+    if 'run.py' in files:
+        # read the __init__.py file and obtain the metadata
+        with open(init_path) as f:
+            metadata = dict(re.findall(METADATA_PATTERN, f.read()))
+
+        # read the run.py file and obtain the metadata and the docstring
+        with open(run_path) as f:
+            py_string = f.read()
+            metadata_run = dict(re.findall(METADATA_RUN_PATTERN, py_string))
+            module = ast.parse(py_string)
+            docstring = ast.get_docstring(module)
+
+        titleString = ''
+        if 'DESCRIPTIVE_NAME' in metadata_run.keys():
+            titleString = titleString + '<h1>' + metadata_run.get('DESCRIPTIVE_NAME') + '</h1>\n'
+        titleString = titleString \
+                + '<i>See <a href="https://git.opencarp.org/openCARP/experiments/-/blob/master/' \
+                + str(run_path) + '" target="_blank">code</a> in GitLab.</i><br/>\n'
+        if 'AUTHOR' in metadata_run.keys():
+            titleString = titleString + '<i>Author: ' + metadata_run.get('AUTHOR') + '</i>\n'
+
+        # search for :ref:
+        for m in re.finditer(REF_PATTERN, docstring):
+            text, ref = m.group(1), m.group(2)
+
+            if ref in refs and refs[ref] is not None:
+                target = refs[ref]
+                docstring = docstring.replace(m.group(0), f'`{text} <{target}>`_')
+            else:
+                logger.warning(f'Reference {m.group(0)} missing')
+                docstring = docstring.replace(m.group(0), text)
+
+        # search for .. figure::
+        images = []
+        for m in re.finditer(FIGURE_PATTERN, docstring):
+            figure = m.group(1)
+            image = figure.replace('/images/', '')
+            images.append(image)
+            if output_html:
+                docstring = docstring.replace(figure, image)
+            else:
+                docstring = docstring.replace(figure, str(Path(root_path.name.lower()) / image))
+
+        # append image from the metadata to the image list
+        if metadata.get('image'):
+            image_name = metadata.get('image').replace('/images/', '')
+            thumb_name = 'thumb_' + image_name
+            with open(images_path / image_name, 'r+b') as f:
+                with Image.open(f) as image:
+                    w, h = image.size
+                    if w > 200:
+                        cover = resizeimage.resize_width(image, 200)
+                    cover.save(images_path / thumb_name, image.format)
+            images.append(thumb_name)
+
+        image = metadata.get('image', '').replace('/images/', '')
+        return {
+            'root': root,
+            'type': 'run',
+            'title': metadata.get('title', ''),
+            'description': metadata.get('description', ''),
+            'thumb_name': ('thumb_' + image) if image else '',
+            'title_string': titleString,
+            'docstring': docstring,
+            'images': images
+        }
+
+    elif '__init__.py' in files:
+        # read the __init__.py file and obtain the metadata
+        with open(init_path) as f:
+            metadata = dict(re.findall(METADATA_PATTERN, f.read()))
+
+        return {
+            'root': root,
+            'type': 'index',
+            'title': metadata.get('title', '')
+        }
+
+
+def read_experiments(source_path, refs, images_path=None, output_html=False, workers=None, batch_size=None):
+    """
+    Walk the source tree once, read all experiments (see read_experiment) and convert their docstrings
+    to HTML with pandoc, using up to workers pandoc processes at the same time.
+
+    :param source_path: path to the source directory
+    :type source_path: pathlib.Path
+    :param workers: maximum number of pandoc processes at the same time (default: number of CPUs)
+    :type workers: int
+    :param batch_size: number of docstrings converted by one pandoc process (default: one process per docstring)
+    :type batch_size: int
+    :return: list of experiments in the order of the walk
+    :rtype: list
+    """
+    experiments = []
+    for root, dirs, files in os.walk(source_path):
+        # skip source_path itself
+        if root != source_path:
+            experiment = read_experiment(root, files, refs, images_path, output_html)
+            if experiment is not None:
+                experiments.append(experiment)
+
+    # create content from the docstrings using pandoc
+    run_experiments = [experiment for experiment in experiments if experiment['type'] == 'run']
+    bodies = convert_texts([experiment.pop('docstring') for experiment in run_experiments], to='html',
+                           format='rst', extra_args=PANDOC_EXTRA_ARGS, options=PANDOC_OPTIONS,
+                           workers=workers, batch_size=batch_size)
+
+    for experiment, body in zip(run_experiments, bodies):
+        # convert RST section headers to level 2 headings
+        body = body.replace('<h1 id=', '<h2 id=')
+        body = body.replace('</h1>', '</h2>')
+        experiment['body'] = experiment.pop('title_string') + body
+
+    return experiments
+
+
+def write_experiment(experiment, source_path, page_path, header, footer, images_path=None, output_html=False):
+    """
+    Write an experiment to the page tree below a Grav page.
+
+    :param experiment: experiment as returned by read_experiment
+    :type experiment: dict
+    :param source_path: path to the source directory
+    :type source_path: pathlib.Path
+    :param page_path: path to the Grav page of the pipeline
+    :type page_path: pathlib.Path
+    :param header: header prepended to the content
+    :type header: str
+    :param footer: footer appended to the content
+    :type footer: str
+    :return: True if the page was written, False if it was unchanged
+    :rtype: bool
+    """
+    md_name = 'default.html' if output_html else 'default.md'
+    md_path = Path(experiment['root'].replace(str(source_path), str(page_path.parent)).lower()) / md_name
+
+    # create directories in the grav tree
+    md_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if experiment['type'] == 'run':
+        content = header + experiment['body'] + footer
+
+        # update or create markdown file
+        try:
+            page = frontmatter.load(md_path)
+            page.content = content
+            page['title'] = experiment['title']
+            page['description'] = experiment['description']
+            page['image'] = experiment['thumb_name']
+
+        except FileNotFoundError:
+            page = frontmatter.Post(content, title=experiment['title'], description=experiment['description'],
+                                    image=experiment['thumb_name'])
+
+        # write the grav file, if it changed
+        if output_html:
+            written = write_page(md_path, content)
+        else:
+            written = write_page(md_path, frontmatter.dumps(page))
+
+        # copy images
+        if images_path is not None:
+            for image in experiment['images']:
+                source = images_path / image
+                destination = md_path.parent / image
+
+                try:
+                    if destination.exists() and filecmp.cmp(source, destination, shallow=False):
+                        continue
+                    shutil.copy(source, destination)
+                    logger.debug(f'Copy image {source} to {destination}')
+                except FileNotFoundError:
+                    logger.warning(f'Image {source} missing')
+
+        return written
+
+    else:
+        page = frontmatter.Post('', title=experiment['title'], cards={'items': '@self.children'})
+
+        # write the grav file, if it changed
+        return write_page(md_path, frontmatter.dumps(page))
+
+
 def main():
     parser = create_parser()
 
@@ -91,10 +308,6 @@ def main():
         'PIPELINE_SOURCE'
     ])
 
-    # compile patterns
-    ref_pattern = re.compile(REF_PATTERN)
-    figure_pattern = re.compile(FIGURE_PATTERN)
-
     # get the source path
     source_path = Path(settings.PIPELINE_SOURCE).expanduser()
 
@@ -127,148 +340,20 @@ def main():
     else:
         refs = {}
 
-    # loop over all experiments
-    for page_path, page, _ in collect_pages(settings.GRAV_PATH, settings.PIPELINE):
-        for root, dirs, files in os.walk(source_path):
-            # skip source_path itself
-            if root != source_path:
-                root_path = Path(root)
-                run_path = root_path / 'run.py'
-                init_path = root_path / '__init__.py'
-                if settings.OUTPUT_HTML:
-                    md_path = Path(root.replace(str(source_path), str(page_path.parent)).lower()) / 'default.html'
-                else:
-                    md_path = Path(root.replace(str(source_path), str(page_path.parent)).lower()) / 'default.md'
-
-                if 'run.py' in files:
-                    # read the __init__.py file and obtain the metadata
-                    with open(init_path) as f:
-                        metadata = dict(re.findall(METADATA_PATTERN, f.read()))
-
-                    # read the run.py file and obtain the metadata
-                    with open(run_path) as f:
-                        metadata_run = dict(re.findall(METADATA_RUN_PATTERN, f.read()))
-                    titleString = ''
-                    if 'DESCRIPTIVE_NAME' in metadata_run.keys():
-                        titleString = titleString + '<h1>' + metadata_run.get('DESCRIPTIVE_NAME') + '</h1>\n'
-                    titleString = titleString \
-                            + '<i>See <a href="https://git.opencarp.org/openCARP/experiments/-/blob/master/' \
-                            + str(run_path) + '" target="_blank">code</a> in GitLab.</i><br/>\n'
-                    if 'AUTHOR' in metadata_run.keys():
-                        titleString = titleString + '<i>Author: ' + metadata_run.get('AUTHOR') + '</i>\n'
-
-                    # read the run.py file and obtain the docstring
-                    with open(run_path) as f:
-                        py_string = f.read()
-                        module = ast.parse(py_string)
-                        docstring = ast.get_docstring(module)
-
-                    # search for :ref:
-                    for m in ref_pattern.finditer(docstring):
-                        text, ref = m.group(1), m.group(2)
-
-                        if ref in refs and refs[ref] is not None:
-                            target = refs[ref]
-                            docstring = docstring.replace(m.group(0), f'`{text} <{target}>`_')
-                        else:
-                            logger.warning(f'Reference {m.group(0)} missing')
-                            docstring = docstring.replace(m.group(0), text)
-
-                    # search for .. figure::
-                    images = []
-                    for m in figure_pattern.finditer(docstring):
-                        figure = m.group(1)
-                        image = figure.replace('/images/', '')
-                        images.append(image)
-                        if settings.OUTPUT_HTML:
-                            docstring = docstring.replace(figure, image)
-                        else:
-                            docstring = docstring.replace(figure, str(Path(root_path.name.lower()) / image))
-
-                    # append image from the metadata to the image list
-                    if metadata.get('image'):
-                        image_name = metadata.get('image').replace('/images/', '')
-                        thumb_name = 'thumb_' + image_name
-                        with open(images_path / image_name, 'r+b') as f:
-                            with Image.open(f) as image:
-                                w, h = image.size
-                                if w > 200:
-                                    cover = resizeimage.resize_width(image, 200)
-                                cover.save(images_path / thumb_name, image.format)
-                        images.append(thumb_name)
-
-                    # create content from the docstring using pandoc
-                    # we should probably add '--shift-heading-level-by=1' to extra_args but it doesn't
-                    # seem to be supported by our pandoc version
-                    body = pypandoc.convert_text(docstring, to='html', format='rst',
-                                                 extra_args=['--mathjax', '--wrap=preserve'])
-
-                    # convert RST section headers to level 2 headings
-                    body = body.replace('<h1 id=', '<h2 id=')
-                    body = body.replace('</h1>', '</h2>')
-                    content = header + titleString + body + footer
-
-                    # create directories in the grav tree
-                    md_path.parent.mkdir(parents=True, exist_ok=True)
-
-                    # update or create markdown file
-                    title = metadata.get('title', '')
-                    description = metadata.get('description', '')
-                    image = metadata.get('image', '').replace('/images/', '')
-                    thumb_name = ''
-                    if image:
-                        thumb_name = 'thumb_' + image
-
-
-                    try:
-                        page = frontmatter.load(md_path)
-                        page.content = content
-                        page['title'] = title
-                        page['description'] = description
-                        page['image'] = thumb_name
-
-                    except FileNotFoundError:
-                        page = frontmatter.Post(content, title=title, description=description, image=thumb_name)
-
-                    # write the grav file
-                    logger.info('writing to %s', md_path)
-                    if settings.OUTPUT_HTML:
-                        md_path.write_text(content)
-                    else:
-                        md_path.write_text(frontmatter.dumps(page))
-
-                    # copy images
-                    if images_path is not None:
-                        for image in images:
-                            source = images_path / image
-                            destination = md_path.parent / image
-
-                            try:
-                                shutil.copy(source, destination)
-                                logger.debug(f'Copy image {source} to {destination}')
-                            except FileNotFoundError:
-                                logger.warning(f'Image {source} missing')
-
-                elif '__init__.py' in files:
-                    # create directories in the grav tree
-                    md_path.parent.mkdir(parents=True, exist_ok=True)
-
-                    # read the __init__.py file and obtain the metadata
-                    with open(init_path) as f:
-                        metadata = dict(re.findall(METADATA_PATTERN, f.read()))
-
-                    content = ''
-                    metadata = {
-                        'title': metadata.get('title', ''),
-                        'cards': {
-                            'items': '@self.children'
-                        }
-                    }
-                    page = frontmatter.Post(content, **metadata)
-
-                    # write the grav file
-                    logger.info('writing to %s', md_path)
-                    md_path.write_text(frontmatter.dumps(page))
+    pages = collect_pages(settings.GRAV_PATH, settings.PIPELINE)
+    if not pages:
+        return
+
+    # read and convert all experiments once, then write them below every page of the pipeline
+    experiments = read_experiments(source_path, refs, images_path, settings.OUTPUT_HTML,
+                                   workers=settings.PIPELINE_WORKERS, batch_size=settings.PANDOC_BATCH_SIZE)
+    written = []
+    for page_path, page, _ in pages:
+        for experiment in experiments:
+            written.append(write_experiment(experiment, source_path, page_path, header, footer,
+                                            images_path, settings.OUTPUT_HTML))
+
+    report_pages(written)
 
 
 def main_deprecated():
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""Run a sequence of FACILE-RS commands from a manifest file.
+
+Description
+-----------
+
+This script runs the commands declared in a YAML (or JSON) manifest file one after another in the same process.
+The commands share the HTTP connections and caches, and the CodeMeta files and other documents are only fetched
+and parsed once, unless they are modified by one of the commands (e.g. ``release prepare``).
+
+The manifest contains a list of ``steps``, each with a ``command`` and optional ``args``, given as a list,
+as a string or as a mapping of options to values. The optional ``env`` mapping sets environment variables for all
+steps, which can be used for settings shared by all commands. The options for the HTTP session and the caches
+given to this script are passed on to all steps in the same way, and a step can override them in its ``args``.
+The log level of this script applies to all steps, unless a step sets its own level, which only applies to this
+step. The log file is shared by all steps and can only be given to this script. The commands stop at the first
+failing step.
+
+.. code-block:: yaml
+
+    env:
+      CODEMETA_LOCATION: codemeta.json
+    steps:
+      - command: release prepare
+        args:
+          version: 1.0.0
+      - command: cff create
+        args: --cff-path CITATION.cff
+      - command: datacite create
+        args: [--datacite-path, datacite.xml]
+
+Usage
+-----
+
+.. argparse::
+   :module: facile_rs.run_manifest
+   :func: create_parser
+   :prog: run_manifest.py
+
+"""
+
+import argparse
+import logging
+import os
+import shlex
+import sys
+import time
+
+from .utils import cli, settings
+from .utils.http import close_session, fetch_dict
+
+logger = logging.getLogger(__file__)
+
+# settings of the HTTP session and the caches, which are passed on from the options of run to all steps
+SHARED_SETTINGS = ['CACHE_DIR', 'HTTP_CACHE_SIZE', 'CACHE_TTL', 'PANDOC_CACHE_SIZE',
+                   'HTTP_TIMEOUT', 'HTTP_POOL_SIZE', 'HTTP_RETRIES']
+
+
+def create_parser(add_help=True):
+    parser = argparse.ArgumentParser(add_help=add_help)
+    parser.add_argument('manifest',
+                        help='Location of the manifest file')
+    cli.add_cache_arguments(parser, lookups=True, pandoc=True)
+    cli.add_http_arguments(parser)
+    parser.add_argument('--log-level', dest='log_level',
+                        help='Log level (ERROR, WARN, INFO, or DEBUG)')
+    parser.add_argument('--log-file', dest='log_file',
+                        help='Path to the log file')
+    return parser
+
+
+def get_step_argv(args):
+    """
+    Convert the args of a step to a list of command line arguments.
+
+    :param args: arguments as a list, as a string or as a mapping of options to values,
+        e.g. {'cff-path': 'CITATION.cff'}, True adds the option as a flag, lists add it repeatedly
+    :type args: list or str or dict or None
+    :return: command line arguments
+    :rtype: list
+    """
+    if args is None:
+        return []
+    elif isinstance(args, str):
+        return shlex.split(args)
+    elif isinstance(args, list):
+        return [str(arg) for arg in args]
+
+    argv = []
+    for key, value in args.items():
+        option = '--' + key.lstrip('-').replace('_', '-')
+        if value is True:
+            argv.append(option)
+        elif isinstance(value, list):
+            for item in value:
+                argv += [option, str(item)]
+        elif value not in [None, False]:
+            argv += [option, str(value)]
+    return argv
+
+
+def get_step_script(command):
+    """
+    Import the script of a command of the facile-rs command line tool.
+
+    :param command: command, e.g. 'cff create'
+    :type command: str
+    :return: the imported script
+    """
+    try:
+        subcommand_name, command_name = command.split()
+        module_name, _ = cli.COMMANDS[subcommand_name][1][command_name]
+    except (ValueError, KeyError) as e:
+        raise RuntimeError(f'{command} is not a valid command.') from e
+
+    return cli.import_script(module_name)
+
+
+def run_step(command, argv):
+    """
+    Run a command in the current process, as if it was called as 'facile-rs <command> <argv>'.
+
+    :param command: command, e.g. 'cff create'
+    :type command: str
+    :param argv: command line arguments
+    :type argv: list
+    """
+    script = get_step_script(command)
+
+    # settings from the previous steps must not leak into this step
+    settings.reset()
+
+    # the log level of a step must not leak into the following steps either
+    sys_argv, log_level = sys.argv, logging.getLogger().level
+    sys.argv = [f'facile-rs {command}', *argv]
+    try:
+        script.main()
+    finally:
+        sys.argv = sys_argv
+        logging.getLogger().setLevel(log_level)
+
+
+def main():
+    parser = create_parser()
+
+    settings.setup(parser)
+
+    manifest = fetch_dict(settings.MANIFEST)
+    steps = manifest.get('steps') or []
+    if not steps:
+        parser.error(f'{settings.MANIFEST} does not contain any steps.')
+
+    # validate all steps before running the first one
+    for step in steps:
+        get_step_script(step.get('command', ''))
+
+        # logging is only configured once per process, by this script
+        if any(arg == '--log-file' or arg.startswith('--log-file=') for arg in get_step_argv(step.get('args'))):
+            parser.error('--log-file can not be given to a step, only to facile-rs run.')
+
+    environ = os.environ.copy()
+    os.environ.update({key: str(value) for key, value in (manifest.get('env') or {}).items()})
+    os.environ.update({key: str(getattr(settings, key)) for key in SHARED_SETTINGS
+                       if getattr(settings, key) is not None})
+
+    try:
+        for i, step in enumerate(steps, start=1):
+            command, argv = step['command'], get_step_argv(step.get('args'))
+            logger.info('step %s: facile-rs %s %s', i, command, shlex.join(argv))
+
+            start = time.perf_counter()
+            try:
+                run_step(command, argv)
+            except SystemExit as e:
+                if e.code not in [None, 0]:
+                    logger.error('step %s (facile-rs %s) failed', i, command)
+                    raise
+            except Exception:
+                logger.error('step %s (facile-rs %s) failed', i, command)
+                raise
+
+            logger.info('step %s: done in %.2f s', i, time.perf_counter() - start)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        close_session()
+
+
+if __name__ == "__main__":
+    main()
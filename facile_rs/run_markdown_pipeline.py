@@ -37,7 +37,7 @@ import frontmatter
 import yaml
 
 from .utils import cli, settings
-from .utils.grav import collect_pages
+from .utils.grav import collect_pages, report_pages, write_page
 
 logger = logging.getLogger(__file__)
 
@@ -51,6 +51,7 @@ def create_parser(add_help=True):
                         help='Name of the pipeline as specified in the GRAV metadata.')
     parser.add_argument('--pipeline-source', dest='pipeline_source',
                         help='Path to the source directory for the pipeline.')
+    cli.add_cache_arguments(parser, http=False)
     parser.add_argument('--log-level', dest='log_level',
                         help='Log level (ERROR, WARN, INFO, or DEBUG)')
     parser.add_argument('--log-file', dest='log_file',
@@ -68,6 +69,7 @@ def main():
     ])
 
     # loop over the tagged pages and write the content into the files
+    written = []
     for page_path, page, source in collect_pages(settings.GRAV_PATH, settings.PIPELINE):
         source_path = Path(settings.PIPELINE_SOURCE).expanduser() / source
 
@@ -83,9 +85,10 @@ def main():
         else:
             page.content = source_path.read_text()
 
-        # write the page file
-        logger.info('writing content to %s', page_path)
-        page_path.write_text(frontmatter.dumps(page))
+        # write the page file, if it changed
+        written.append(write_page(page_path, frontmatter.dumps(page)))
+
+    report_pages(written)
 
 
 def main_deprecated():
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+import pytest
+
+from facile_rs.utils import cli
+
+HEAVY_MODULES = ['PIL', 'bagit', 'frontmatter', 'pypandoc', 'resizeimage']
+
+# imports the CLI like the facile-rs entry point does and prints the heavy modules which were imported
+IMPORT_SCRIPT = '''
+import sys
+
+from facile_rs.utils import cli
+cli.create_parser(command=({!r}, {!r}))
+
+print(' '.join(sorted(module for module in {!r} if module in sys.modules)))
+'''
+
+
+@pytest.mark.parametrize('command', [
+    ('cff', 'create'),
+    ('datacite', 'create'),
+    ('release', 'prepare'),
+    ('zenodo', 'upload'),
+])
+def test_lazy_import(command):
+    code = IMPORT_SCRIPT.format(*command, HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+
+def test_selected_command():
+    parser = cli.create_parser(command=('grav', 'docstring'))
+    args = parser.parse_args(['grav', 'docstring'])
+
+    from facile_rs import run_docstring_pipeline
+    assert args.func is run_docstring_pipeline.main
+
+
+def test_all_commands():
+    parser = cli.create_parser()
+    for subcommand, (_, commands) in cli.COMMANDS.items():
+        for command, (module_name, _) in commands.items():
+            args = parser.parse_args([subcommand, command])
+            assert args.func is cli.import_script(module_name).main
+
+
+def test_shared_arguments():
+    parser = cli.create_parser()
+    for subcommand, (_, commands) in cli.COMMANDS.items():
+        for command in commands:
+            if subcommand != 'grav':
+                args = parser.parse_args([subcommand, command, '--http-timeout', '5', '--cache-dir', 'cache'])
+                assert (args.http_timeout, args.cache_dir) == (5, 'cache')
+
+    args = parser.parse_args(['run', 'manifest.yml', '--http-retries', '1', '--pandoc-cache-size', '0'])
+    assert (args.http_retries, args.pandoc_cache_size) == (1, 0)
@@ -0,0 +1,118 @@
+import json
+import shutil
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from os import path
+
+import pytest
+
+from facile_rs import convert_bulk
+from facile_rs.convert_bulk import get_codemeta_locations, get_output_name, main
+
+SCRIPT_DIR = path.dirname(path.realpath(__file__))
+CODEMETA_LOCATION = path.join(path.dirname(path.dirname(SCRIPT_DIR)), 'codemeta.json')
+
+
+def test_cli(monkeypatch, tmpdir):
+    for name in ['foo', 'bar']:
+        tmpdir.mkdir(name)
+        shutil.copy(CODEMETA_LOCATION, tmpdir.join(name, 'codemeta.json'))
+
+    output_path = tmpdir.join('output')
+    report_path = tmpdir.join('report.json')
+    monkeypatch.setattr('sys.argv',
+                        [
+                            sys.argv[0],
+                            str(tmpdir.join('*', 'codemeta.json')),
+                            str(tmpdir.join('missing', 'codemeta.json')),
+                            '--output-path', str(output_path),
+                            '--report-path', str(report_path),
+                            '--format', 'cff',
+                            '--format', 'datacite',
+                            '--bulk-processes', '2'
+                        ])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+
+    report = json.loads(report_path.read())
+    assert (report['total'], report['succeeded'], report['failed']) == (3, 2, 1)
+    assert [result['location'] for result in report['results']] == [
+        str(tmpdir.join('bar', 'codemeta.json')),
+        str(tmpdir.join('foo', 'codemeta.json')),
+        str(tmpdir.join('missing', 'codemeta.json'))
+    ]
+    assert report['results'][2]['error'].startswith('FileNotFoundError')
+
+    for result in report['results'][:2]:
+        assert result['error'] is None
+        assert sorted(path.basename(file_path) for file_path in result['files']) == ['CITATION.cff', 'datacite.xml']
+        assert all(path.exists(file_path) for file_path in result['files'])
+
+
+def test_broken_process_pool(monkeypatch, tmpdir):
+    class MockExecutor:
+
+        """An executor which converts the first repository and then loses its worker process"""
+
+        def __init__(self, *args, **kwargs):
+            self.futures = []
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def submit(self, func, *args):
+            future = Future()
+            if self.futures:
+                future.set_exception(BrokenProcessPool('A process in the process pool was terminated abruptly.'))
+            else:
+                future.set_result(func(*args))
+            self.futures.append(future)
+            return future
+
+    for name in ['foo', 'bar']:
+        tmpdir.mkdir(name)
+        shutil.copy(CODEMETA_LOCATION, tmpdir.join(name, 'codemeta.json'))
+
+    report_path = tmpdir.join('report.json')
+    monkeypatch.setattr(convert_bulk, 'ProcessPoolExecutor', MockExecutor)
+    monkeypatch.setattr('sys.argv',
+                        [
+                            sys.argv[0],
+                            str(tmpdir.join('*', 'codemeta.json')),
+                            '--output-path', str(tmpdir.join('output')),
+                            '--report-path', str(report_path),
+                            '--format', 'cff',
+                            '--bulk-processes', '2'
+                        ])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+
+    report = json.loads(report_path.read())
+    assert (report['total'], report['succeeded'], report['failed']) == (2, 1, 1)
+    assert report['results'][0]['error'] is None
+    assert report['results'][1]['error'].startswith('BrokenProcessPool')
+
+
+def test_get_codemeta_locations(tmpdir):
+    codemeta_list = tmpdir.join('repositories.txt')
+    codemeta_list.write('# repositories\nhttps://example.org/foo/codemeta.json\n\nbar/codemeta.json\n')
+
+    assert get_codemeta_locations(['bar/codemeta.json'], str(codemeta_list)) == [
+        'bar/codemeta.json',
+        'https://example.org/foo/codemeta.json'
+    ]
+
+
+def test_get_output_name():
+    assert get_output_name('repos/foo/codemeta.json') == 'repos_foo'
+    assert get_output_name('./codemeta.json') == 'codemeta'
+    assert get_output_name('./.config/codemeta.json') == '.config'
+    assert get_output_name('../repos/foo/codemeta.json') == 'repos_foo'
+    assert get_output_name('https://example.org/group/foo/-/raw/main/codemeta.json') == \
+        'example.org_group_foo_-_raw_main'
@@ -0,0 +1,78 @@
+import sys
+from os import path
+
+import bagit
+import pytest
+
+from facile_rs.create_bagpack import main
+
+SCRIPT_DIR = path.dirname(path.realpath(__file__))
+DATACITE_PATH = path.join(SCRIPT_DIR, 'datacite_ref.xml')
+
+
+def test_cli(monkeypatch, tmp_path):
+    assets = []
+    for i in range(3):
+        asset = tmp_path / f'asset-{i}.txt'
+        asset.write_text(f'asset {i}\n')
+        assets.append(str(asset))
+
+    bag_path = tmp_path / 'bag'
+    monkeypatch.setattr('sys.argv',
+                        [
+                            sys.argv[0],
+                            *assets,
+                            '--bag-path', str(bag_path),
+                            '--datacite-path', DATACITE_PATH
+                        ])
+    main()
+
+    bag = bagit.Bag(str(bag_path))
+    bag.validate()
+    assert sorted(bag.payload_files()) == ['data/asset-0.txt', 'data/asset-1.txt', 'data/asset-2.txt']
+    assert 'metadata/datacite.xml' in bag.tagfile_entries()
+
+
+def test_hash_on_fetch(monkeypatch, tmp_path):
+    assets = []
+    for i in range(3):
+        asset = tmp_path / f'asset-{i}.txt'
+        asset.write_text(f'asset {i}\n')
+        assets.append(str(asset))
+
+    bag_path = tmp_path / 'bag'
+    monkeypatch.setattr('sys.argv',
+                        [
+                            sys.argv[0],
+                            *assets,
+                            '--bag-path', str(bag_path),
+                            '--datacite-path', DATACITE_PATH,
+                            '--hash-on-fetch'
+                        ])
+    main()
+
+    bag = bagit.Bag(str(bag_path))
+    bag.validate()
+    assert bag.info['Payload-Oxum'] == '24.3'
+    assert sorted(bag.payload_files()) == ['data/asset-0.txt', 'data/asset-1.txt', 'data/asset-2.txt']
+    assert 'metadata/datacite.xml' in bag.tagfile_entries()
+
+
+@pytest.mark.parametrize('environment', [False, True])
+def test_symlink_strategy(monkeypatch, tmp_path, environment):
+    asset = tmp_path / 'asset.txt'
+    asset.write_text('asset\n')
+
+    # bagit rejects symbolic links, as option or from the environment
+    bag_path = tmp_path / 'bag'
+    argv = [sys.argv[0], str(asset), '--bag-path', str(bag_path), '--datacite-path', DATACITE_PATH]
+    if environment:
+        monkeypatch.setenv('STAGING_STRATEGY', 'symlink')
+    else:
+        argv += ['--staging-strategy', 'symlink']
+
+    monkeypatch.setattr('sys.argv', argv)
+    with pytest.raises(SystemExit):
+        main()
+
+    assert not bag_path.exists()
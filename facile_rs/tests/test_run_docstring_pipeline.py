@@ -0,0 +1,72 @@
+import logging
+import sys
+
+import frontmatter
+import pypandoc
+
+from facile_rs.run_docstring_pipeline import main
+
+RUN_PY = '''"""
+Simple experiment
+=================
+
+This experiment shows :ref:`a reference <ref-target>` and :ref:`a missing one <ref-missing>`.
+"""
+EXAMPLE_DESCRIPTIVE_NAME = 'Simple experiment'
+EXAMPLE_AUTHOR = 'Jane Doe'
+'''
+
+
+def create_tree(tmpdir):
+    grav_path = tmpdir.mkdir('grav')
+    pages_path = grav_path.mkdir('pages')
+    for name in ['01.experiments', '02.examples']:
+        pages_path.mkdir(name).join('experiments.md').write('---\ntitle: Experiments\npipeline: experiments\n---\n')
+
+    source_path = tmpdir.mkdir('experiments')
+    source_path.join('__init__.py').write("__title__ = 'Experiments'\n")
+    simple_path = source_path.mkdir('simple')
+    simple_path.join('__init__.py').write("__title__ = 'Simple'\n__description__ = 'A simple experiment'\n")
+    simple_path.join('run.py').write(RUN_PY)
+
+    refs_path = tmpdir.join('refs.yml')
+    refs_path.write('ref-target: https://example.org/target\n')
+
+    return grav_path, source_path, refs_path
+
+
+def test_cli(monkeypatch, tmpdir, caplog):
+    grav_path, source_path, refs_path = create_tree(tmpdir)
+
+    conversions = []
+    convert_text = pypandoc.convert_text
+    monkeypatch.setattr(pypandoc, 'convert_text',
+                        lambda *args, **kwargs: conversions.append(args[0]) or convert_text(*args, **kwargs))
+    monkeypatch.setattr('sys.argv',
+                        [
+                            sys.argv[0],
+                            '--grav-path', str(grav_path),
+                            '--pipeline', 'experiments',
+                            '--pipeline-source', str(source_path),
+                            '--pipeline-refs', str(refs_path)
+                        ])
+    caplog.set_level(logging.INFO)
+    main()
+
+    # the docstring is converted once, even though two pages use the pipeline
+    assert len(conversions) == 1
+    assert caplog.messages[-1] == '4 pages written, 0 pages unchanged'
+
+    # the converted docstring is taken from the cache in the next run and no page is written again
+    main()
+    assert len(conversions) == 1
+    assert caplog.messages[-1] == '0 pages written, 4 pages unchanged'
+
+    for name in ['01.experiments', '02.examples']:
+        page = frontmatter.load(grav_path.join('pages', name, 'simple', 'default.md'))
+        assert page['title'] == 'Simple'
+        assert page['description'] == 'A simple experiment'
+        assert '<h1>Simple experiment</h1>' in page.content
+        assert '<i>Author: Jane Doe</i>' in page.content
+        assert '<a href="https://example.org/target">a reference</a>' in page.content
+        assert 'a missing one' in page.content
@@ -0,0 +1,106 @@
+import logging
+import sys
+from os import path
+
+import pytest
+import yaml
+
+from facile_rs.run_manifest import get_step_argv, main
+from facile_rs.utils import http
+
+SCRIPT_DIR = path.dirname(path.realpath(__file__))
+METADATA_DIR = path.join(path.dirname(SCRIPT_DIR), 'utils', 'metadata', 'tests')
+
+CODEMETA_LOCATION = path.join(METADATA_DIR, 'codemeta_test.json')
+CREATORS_LOCATIONS = path.join(METADATA_DIR, 'codemeta_authors_test.json')
+CONTRIBUTORS_LOCATIONS = path.join(METADATA_DIR, 'codemeta_contributors_test.json')
+
+
+def test_cli(monkeypatch, tmpdir):
+    output_cff = tmpdir.join('output.cff')
+    output_datacite = tmpdir.join('datacite.xml')
+    manifest = tmpdir.join('manifest.yml')
+    manifest.write(yaml.dump({
+        'env': {
+            'CODEMETA_LOCATION': CODEMETA_LOCATION,
+            'CREATORS_LOCATIONS': CREATORS_LOCATIONS,
+            'CONTRIBUTORS_LOCATIONS': CONTRIBUTORS_LOCATIONS
+        },
+        'steps': [
+            {'command': 'cff create', 'args': f'--cff-path {output_cff}'},
+            {'command': 'datacite create', 'args': {'datacite-path': str(output_datacite)}}
+        ]
+    }))
+
+    parsed = []
+    parse_dict = http.parse_dict
+    monkeypatch.setattr(http, 'parse_dict', lambda location: parsed.append(location) or parse_dict(location))
+    monkeypatch.setattr('sys.argv', [sys.argv[0], str(manifest)])
+    main()
+
+    with open(path.join(SCRIPT_DIR, 'cff_ref.cff')) as cff_ref:
+        assert output_cff.read() == cff_ref.read()
+    with open(path.join(SCRIPT_DIR, 'datacite_ref.xml')) as datacite_ref:
+        assert output_datacite.read() == datacite_ref.read()
+
+    # the CodeMeta files are only parsed once for both steps
+    assert sorted(parsed) == sorted([str(manifest), CODEMETA_LOCATION, CREATORS_LOCATIONS, CONTRIBUTORS_LOCATIONS])
+
+
+def test_invalid_command(monkeypatch, tmpdir):
+    manifest = tmpdir.join('manifest.yml')
+    manifest.write(yaml.dump({'steps': [{'command': 'cff create'}, {'command': 'cff delete'}]}))
+
+    monkeypatch.setattr('sys.argv', [sys.argv[0], str(manifest)])
+    with pytest.raises(RuntimeError, match='cff delete is not a valid command'):
+        main()
+
+
+def test_log_level(monkeypatch, tmpdir, caplog):
+    manifest = tmpdir.join('manifest.yml')
+    manifest.write(yaml.dump({
+        'env': {
+            'CODEMETA_LOCATION': CODEMETA_LOCATION,
+            'CREATORS_LOCATIONS': CREATORS_LOCATIONS,
+            'CONTRIBUTORS_LOCATIONS': CONTRIBUTORS_LOCATIONS
+        },
+        'steps': [
+            {'command': 'cff create', 'args': {'cff-path': str(tmpdir.join('output.cff')), 'log-level': 'ERROR'}},
+            {'command': 'datacite create', 'args': {'datacite-path': str(tmpdir.join('datacite.xml'))}}
+        ]
+    }))
+
+    # the level of run applies to the steps without a level of their own, the level of a step only to this step
+    monkeypatch.delenv('LOG_LEVEL', raising=False)
+    monkeypatch.setattr('sys.argv', [sys.argv[0], str(manifest), '--log-level', 'INFO'])
+    root_level = logging.getLogger().level
+    try:
+        main()
+        assert logging.getLogger().level == logging.INFO
+    finally:
+        logging.getLogger().setLevel(root_level)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('step 1: done') for message in messages)
+    assert any(message.startswith('step 2: done') for message in messages)
+
+
+def test_step_log_file(monkeypatch, tmpdir):
+    manifest = tmpdir.join('manifest.yml')
+    manifest.write(yaml.dump({'steps': [{'command': 'cff create', 'args': {'log-file': 'cff.log'}}]}))
+
+    monkeypatch.setattr('sys.argv', [sys.argv[0], str(manifest)])
+    with pytest.raises(SystemExit):
+        main()
+
+
+def test_get_step_argv():
+    assert get_step_argv(None) == []
+    assert get_step_argv('--cff-path "my file.cff"') == ['--cff-path', 'my file.cff']
+    assert get_step_argv(['--bag-processes', 2]) == ['--bag-processes', '2']
+    assert get_step_argv({
+        'version': '1.0.0',
+        'dry': True,
+        'sort_authors': False,
+        'creators-location': ['a.json', 'b.json']
+    }) == ['--version', '1.0.0', '--dry', '--creators-location', 'a.json', '--creators-location', 'b.json']
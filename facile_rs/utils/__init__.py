@@ -22,6 +22,10 @@ class Settings:
     def __str__(self):
         return str(vars(self))
 
+    def reset(self):
+        # remove all settings, e.g. before the next step of facile-rs run parses its own arguments
+        self._shared_state.clear()
+
     def setup(self, parser, validate=[]):
         # setup env from .env file
         load_dotenv(Path().cwd() / '.env')
@@ -55,6 +59,11 @@ class Settings:
         logging.basicConfig(level=log_level, filename=log_file,
                             format='[%(asctime)s] %(levelname)s %(name)s: %(message)s')
 
+        # basicConfig does nothing once logging is configured, but a later setup (e.g. a step of facile-rs run)
+        # might set another level, otherwise the level of the first setup is kept
+        if getattr(args, 'log_level', None) or os.environ.get('LOG_LEVEL'):
+            logging.getLogger().setLevel(log_level)
+
         # log settings
         logger.debug('settings = %s', self)
 
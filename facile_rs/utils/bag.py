@@ -0,0 +1,98 @@
+import logging
+import os
+import tempfile
+import time
+from datetime import date
+
+import bagit
+
+from .concurrency import get_default_processes
+from .http import STAGING_STRATEGIES
+
+logger = logging.getLogger(__file__)
+
+CHECKSUM_ALGORITHMS = bagit.DEFAULT_CHECKSUMS
+
+# bagit rejects symbolic links in the payload of a bag
+BAG_STAGING_STRATEGIES = [strategy for strategy in STAGING_STRATEGIES if strategy != 'symlink']
+
+
+def make_bag(bag_path, bag_info, processes=None, checksums=None):
+    """
+    Create a BagIt bag in the given directory, hashing the payload files in parallel.
+
+    If the checksums of the payload files are already known, e.g. because they were computed by fetch_files,
+    they are used to write the manifests and the payload files are not read again.
+
+    :param bag_path: path to the directory containing the payload files
+    :type bag_path: pathlib.Path
+    :param bag_info: metadata for the bag-info.txt file
+    :type bag_info: dict
+    :param processes: number of processes used to hash the payload files (default: number of available CPUs)
+    :type processes: int
+    :param checksums: checksums of the payload files by file path, as returned by fetch_files
+    :type checksums: dict
+    :return: the created bag
+    :rtype: bagit.Bag
+    """
+    if checksums is not None:
+        return make_bag_from_checksums(bag_path, bag_info, checksums)
+
+    processes = int(processes) if processes else get_default_processes()
+
+    start = time.perf_counter()
+    bag = bagit.make_bag(str(bag_path), bag_info, processes=processes)
+    seconds = time.perf_counter() - start
+
+    octets = int(bag.info['Payload-Oxum'].split('.')[0])
+    logger.info('hashed %d bytes in %.2f s (%.1f MB/s) using %d processes',
+                octets, seconds, octets / seconds / 1e6 if seconds else 0, processes)
+
+    return bag
+
+
+def make_bag_from_checksums(bag_path, bag_info, checksums):
+    """
+    Create a BagIt bag in the given directory, using precomputed checksums for the payload manifests.
+
+    :param bag_path: path to the directory containing the payload files
+    :type bag_path: pathlib.Path
+    :param bag_info: metadata for the bag-info.txt file
+    :type bag_info: dict
+    :param checksums: checksums of the payload files by file path, for all algorithms in CHECKSUM_ALGORITHMS
+    :type checksums: dict
+    :return: the created bag
+    :rtype: bagit.Bag
+    """
+    file_names = sorted(path.name for path in checksums)
+    if sorted(os.listdir(bag_path)) != file_names:
+        raise RuntimeError(f'The files in {bag_path} do not match the given checksums.')
+
+    # move the payload to the data directory, using a temporary name in case a payload file is called "data"
+    tmp_path = tempfile.mkdtemp(dir=bag_path)
+    for file_name in file_names:
+        os.rename(bag_path / file_name, os.path.join(tmp_path, file_name))
+    os.rename(tmp_path, bag_path / 'data')
+    os.chmod(bag_path / 'data', os.stat(bag_path).st_mode)
+
+    # write the payload manifests
+    for algorithm in CHECKSUM_ALGORITHMS:
+        with open(bag_path / f'manifest-{algorithm}.txt', 'w', encoding='utf-8') as f:
+            for path, digests in sorted(checksums.items(), key=lambda item: item[0].name):
+                file_name = path.name.replace('\r', '%0D').replace('\n', '%0A')
+                f.write(f'{digests[algorithm]}  data/{file_name}\n')
+
+    with open(bag_path / 'bagit.txt', 'w', encoding='utf-8') as f:
+        f.write('BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8\n')
+
+    octets = sum((bag_path / 'data' / file_name).stat().st_size for file_name in file_names)
+
+    # write bag-info.txt and the tag manifests
+    bag = bagit.Bag(str(bag_path))
+    bag.info.update(bag_info)
+    bag.info.setdefault('Bagging-Date', date.today().strftime('%Y-%m-%d'))
+    bag.info.setdefault('Bag-Software-Agent', f'bagit.py v{bagit.VERSION} <{bagit.PROJECT_URL}>')
+    bag.info['Payload-Oxum'] = f'{octets}.{len(file_names)}'
+    bag.save()
+
+    return bag
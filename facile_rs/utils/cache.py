@@ -0,0 +1,495 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from . import settings
+
+logger = logging.getLogger(__file__)
+
+CACHE_TTL = 7 * 24 * 3600
+CACHE_NEGATIVE_TTL = 24 * 3600
+HTTP_CACHE_SIZE = 64 * 1024 * 1024
+PANDOC_CACHE_SIZE = 64 * 1024 * 1024
+
+# shared caches by name, as tuples (arguments, cache), the arguments are None for caches given with set_shared
+_shared = {}
+
+# guards the creation of the shared caches, which might be requested by several worker threads at once
+_lock = threading.Lock()
+
+
+def get_shared(name, cls, *args, **kwargs):
+    """
+    Return a shared cache. The cache is created on first use and created again when the arguments,
+    which are taken from the settings, change (e.g. between the steps of facile-rs run).
+    Caches given with set_shared are kept until they are replaced.
+
+    :param name: name of the shared cache
+    :type name: str
+    :param cls: class of the cache
+    :type cls: type
+    :return: the shared cache
+    """
+    with _lock:
+        arguments, cache = _shared.get(name, (None, None))
+        if cache is None or arguments not in [None, (args, kwargs)]:
+            cache = cls(*args, **kwargs)
+            _shared[name] = ((args, kwargs), cache)
+            logger.debug('name = %s, args = %s, kwargs = %s', name, args, kwargs)
+
+        return cache
+
+
+def set_shared(name, cache):
+    """
+    Replace a shared cache.
+
+    :param name: name of the shared cache
+    :type name: str
+    :param cache: the cache to use from now on, None to create a new one on next use
+    """
+    with _lock:
+        if cache is None:
+            _shared.pop(name, None)
+        else:
+            _shared[name] = (None, cache)
+
+
+def get_cache_dir():
+    """
+    Get the directory where FACILE-RS keeps its caches: CACHE_DIR from the settings,
+    or facile-rs in XDG_CACHE_HOME or ~/.cache.
+
+    :return: path to the cache directory
+    :rtype: pathlib.Path
+    """
+    cache_dir = getattr(settings, 'CACHE_DIR', None)
+    if cache_dir:
+        return Path(cache_dir).expanduser()
+    return Path(os.environ.get('XDG_CACHE_HOME') or '~/.cache').expanduser() / 'facile-rs'
+
+
+class Cache:
+
+    """A persistent key-value cache with expiry, stored in a SQLite database"""
+
+    def __init__(self, path, ttl=CACHE_TTL, negative_ttl=CACHE_NEGATIVE_TTL):
+        """
+        Initialize the cache. The database is created on first write.
+
+        :param path: path to the SQLite database
+        :type path: pathlib.Path
+        :param ttl: time in seconds after which entries expire, 0 disables the cache
+        :type ttl: float
+        :param negative_ttl: time in seconds after which negative entries (None) expire
+        :type negative_ttl: float
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+        return connection
+
+    def get(self, key):
+        """
+        Get an entry from the cache.
+
+        :param key: key of the entry
+        :type key: str
+        :return: a tuple (found, value), found is False if the entry is missing or has expired
+        :rtype: tuple
+        """
+        if not self.ttl or not self.path.exists():
+            return False, None
+
+        with closing(self.connect()) as connection:
+            row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key, )).fetchone()
+
+        if row is None or row[1] < time.time():
+            return False, None
+
+        logger.debug('cache hit for %s', key)
+        return True, json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Store an entry in the cache. None values are stored as negative entries, which expire earlier.
+
+        :param key: key of the entry
+        :type key: str
+        :param value: JSON serializable value
+        """
+        if not self.ttl:
+            return
+
+        expires = time.time() + (self.ttl if value is not None else min(self.ttl, self.negative_ttl))
+        with closing(self.connect()) as connection, connection:
+            connection.execute('REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                               (key, json.dumps(value), expires))
+
+    def clear(self, prefix=''):
+        """
+        Remove all entries, or all entries whose key starts with prefix, from the cache.
+
+        :param prefix: prefix of the keys to remove
+        :type prefix: str
+        :return: number of removed entries
+        :rtype: int
+        """
+        if not self.path.exists():
+            return 0
+
+        with closing(self.connect()) as connection, connection:
+            pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            return connection.execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (pattern, )).rowcount
+
+
+def get_cache():
+    """
+    Return the cache shared by all lookups of FACILE-RS.
+
+    The cache is created on first use, in the directory returned by get_cache_dir and with CACHE_TTL
+    from the settings, and is created again when these settings change.
+
+    :return: the shared cache
+    :rtype: Cache
+    """
+    ttl = getattr(settings, 'CACHE_TTL', None)
+    ttl = float(ttl) if ttl is not None else CACHE_TTL
+    return get_shared('cache', Cache, get_cache_dir() / 'cache.sqlite3', ttl=ttl)
+
+
+def set_cache(cache):
+    """
+    Replace the shared cache, e.g. to use a temporary cache in tests.
+
+    :param cache: the cache to use for all following lookups, None to create a new one on next use
+    :type cache: Cache
+    """
+    set_shared('cache', cache)
+
+
+def evict(connection, table, max_size):
+    """
+    Remove the least recently used rows from a table with size and accessed columns,
+    until the total size is below max_size.
+
+    :param connection: connection to the SQLite database
+    :type connection: sqlite3.Connection
+    :param table: name of the table
+    :type table: str
+    :param max_size: maximum total size in bytes
+    :type max_size: int
+    """
+    total_size = 0
+    for key, size in connection.execute(f'SELECT key, size FROM {table} ORDER BY accessed DESC').fetchall():
+        total_size += size
+        if total_size > max_size:
+            logger.debug('evict %s', key)
+            connection.execute(f'DELETE FROM {table} WHERE key = ?', (key, ))
+
+
+class HttpCache:
+
+    """A size-bounded cache for HTTP responses with validators (ETag or Last-Modified), stored in a SQLite database.
+
+    When the cache is full, the least recently used responses are removed.
+    """
+
+    def __init__(self, path, max_size=HTTP_CACHE_SIZE):
+        """
+        Initialize the cache. The database is created on first write.
+
+        :param path: path to the SQLite database
+        :type path: pathlib.Path
+        :param max_size: maximum size in bytes of the stored responses, 0 disables the cache
+        :type max_size: int
+        """
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS http_cache (key TEXT PRIMARY KEY, etag TEXT, '
+                           'last_modified TEXT, content TEXT, size INTEGER, accessed REAL)')
+        return connection
+
+    def get(self, key):
+        """
+        Get a response from the cache and mark it as recently used.
+
+        :param key: key of the response, e.g. the URL
+        :type key: str
+        :return: a tuple (etag, last_modified, content) or None if the response is not in the cache
+        :rtype: tuple
+        """
+        if not self.max_size or not self.path.exists():
+            return None
+
+        with closing(self.connect()) as connection, connection:
+            row = connection.execute('SELECT etag, last_modified, content FROM http_cache WHERE key = ?',
+                                     (key, )).fetchone()
+            if row is not None:
+                connection.execute('UPDATE http_cache SET accessed = ? WHERE key = ?', (time.time(), key))
+
+        return row
+
+    def set(self, key, etag, last_modified, content):
+        """
+        Store a response in the cache and remove the least recently used responses if the cache is full.
+        Responses larger than the cache are not stored.
+
+        :param key: key of the response, e.g. the URL
+        :type key: str
+        :param etag: ETag header of the response
+        :type etag: str
+        :param last_modified: Last-Modified header of the response
+        :type last_modified: str
+        :param content: decoded body of the response
+        :type content: str
+        """
+        size = len(content.encode())
+        if not self.max_size or size > self.max_size:
+            return
+
+        with closing(self.connect()) as connection, connection:
+            connection.execute('REPLACE INTO http_cache (key, etag, last_modified, content, size, accessed) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', (key, etag, last_modified, content, size, time.time()))
+            evict(connection, 'http_cache', self.max_size)
+
+    def clear(self):
+        """
+        Remove all responses from the cache.
+
+        :return: number of removed responses
+        :rtype: int
+        """
+        if not self.path.exists():
+            return 0
+
+        with closing(self.connect()) as connection, connection:
+            return connection.execute('DELETE FROM http_cache').rowcount
+
+
+def get_http_cache():
+    """
+    Return the HTTP cache shared by fetch_dict and fetch_json.
+
+    The cache is created on first use, in the directory returned by get_cache_dir and with HTTP_CACHE_SIZE
+    from the settings.
+
+    :return: the shared HTTP cache
+    :rtype: HttpCache
+    """
+    max_size = getattr(settings, 'HTTP_CACHE_SIZE', None)
+    max_size = int(max_size) if max_size is not None else HTTP_CACHE_SIZE
+    return get_shared('http_cache', HttpCache, get_cache_dir() / 'http.sqlite3', max_size=max_size)
+
+
+def set_http_cache(http_cache):
+    """
+    Replace the shared HTTP cache, e.g. to use a temporary cache in tests.
+
+    :param http_cache: the cache to use for all following requests, None to create a new one on next use
+    :type http_cache: HttpCache
+    """
+    set_shared('http_cache', http_cache)
+
+
+class PandocCache:
+
+    """A size-bounded, content-addressed cache for the output of pandoc, stored in a SQLite database.
+
+    When the cache is full, the least recently used outputs are removed.
+    """
+
+    def __init__(self, path, max_size=PANDOC_CACHE_SIZE):
+        """
+        Initialize the cache. The database is created on first write.
+
+        :param path: path to the SQLite database
+        :type path: pathlib.Path
+        :param max_size: maximum size in bytes of the stored outputs, 0 disables the cache
+        :type max_size: int
+        """
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS pandoc_cache (key TEXT PRIMARY KEY, content TEXT, '
+                           'size INTEGER, accessed REAL)')
+        return connection
+
+    def get_many(self, keys):
+        """
+        Get outputs from the cache and mark them as recently used.
+
+        :param keys: keys of the outputs, see facile_rs.utils.pandoc.get_conversion_key
+        :type keys: list
+        :return: outputs by key, keys which are not in the cache are missing
+        :rtype: dict
+        """
+        if not self.max_size or not self.path.exists():
+            return {}
+
+        outputs = {}
+        with closing(self.connect()) as connection, connection:
+            for key in set(keys):
+                row = connection.execute('SELECT content FROM pandoc_cache WHERE key = ?', (key, )).fetchone()
+                if row is not None:
+                    outputs[key] = row[0]
+                    connection.execute('UPDATE pandoc_cache SET accessed = ? WHERE key = ?', (time.time(), key))
+
+        return outputs
+
+    def set_many(self, outputs):
+        """
+        Store outputs in the cache and remove the least recently used outputs if the cache is full.
+
+        :param outputs: outputs by key
+        :type outputs: dict
+        """
+        if not self.max_size or not outputs:
+            return
+
+        with closing(self.connect()) as connection, connection:
+            for key, content in outputs.items():
+                size = len(content.encode())
+                if size <= self.max_size:
+                    connection.execute('REPLACE INTO pandoc_cache (key, content, size, accessed) VALUES (?, ?, ?, ?)',
+                                       (key, content, size, time.time()))
+            evict(connection, 'pandoc_cache', self.max_size)
+
+    def clear(self):
+        """
+        Remove all outputs from the cache.
+
+        :return: number of removed outputs
+        :rtype: int
+        """
+        if not self.path.exists():
+            return 0
+
+        with closing(self.connect()) as connection, connection:
+            return connection.execute('DELETE FROM pandoc_cache').rowcount
+
+
+def get_pandoc_cache():
+    """
+    Return the cache for the output of pandoc, used by the Grav pipelines.
+
+    The cache is created on first use, in the directory returned by get_cache_dir and with PANDOC_CACHE_SIZE
+    from the settings.
+
+    :return: the shared pandoc cache
+    :rtype: PandocCache
+    """
+    max_size = getattr(settings, 'PANDOC_CACHE_SIZE', None)
+    max_size = int(max_size) if max_size is not None else PANDOC_CACHE_SIZE
+    return get_shared('pandoc_cache', PandocCache, get_cache_dir() / 'pandoc.sqlite3', max_size=max_size)
+
+
+def set_pandoc_cache(pandoc_cache):
+    """
+    Replace the shared pandoc cache, e.g. to use a temporary cache in tests.
+
+    :param pandoc_cache: the cache to use for all following conversions, None to create a new one on next use
+    :type pandoc_cache: PandocCache
+    """
+    set_shared('pandoc_cache', pandoc_cache)
+
+
+class PageIndex:
+
+    """A persistent index of the front matter of Grav pages, stored in a SQLite database.
+
+    The entries are keyed by the path of the page and are only valid as long as the modification
+    time and the size of the file are unchanged.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the index. The database is created on first write.
+
+        :param path: path to the SQLite database
+        :type path: pathlib.Path
+        """
+        self.path = Path(path)
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS page_index (path TEXT PRIMARY KEY, mtime_ns INTEGER, '
+                           'size INTEGER, header TEXT)')
+        return connection
+
+    def get_prefix(self, root):
+        prefix = os.path.join(str(root), '')
+        return len(prefix), prefix
+
+    def get_all(self, root):
+        """
+        Get all entries for the pages below a directory.
+
+        :param root: path to the directory
+        :type root: pathlib.Path
+        :return: tuples (mtime_ns, size, header) by path
+        :rtype: dict
+        """
+        if not self.path.exists():
+            return {}
+
+        with closing(self.connect()) as connection:
+            rows = connection.execute('SELECT path, mtime_ns, size, header FROM page_index '
+                                      'WHERE substr(path, 1, ?) = ?', self.get_prefix(root)).fetchall()
+
+        return {path: (mtime_ns, size, json.loads(header)) for path, mtime_ns, size, header in rows}
+
+    def set_all(self, root, entries):
+        """
+        Replace all entries for the pages below a directory, so that removed pages are dropped from the index.
+
+        :param root: path to the directory
+        :type root: pathlib.Path
+        :param entries: tuples (mtime_ns, size, header) by path, the header needs to be JSON serializable
+        :type entries: dict
+        """
+        with closing(self.connect()) as connection, connection:
+            connection.execute('DELETE FROM page_index WHERE substr(path, 1, ?) = ?', self.get_prefix(root))
+            connection.executemany('INSERT INTO page_index (path, mtime_ns, size, header) VALUES (?, ?, ?, ?)',
+                                   [(path, mtime_ns, size, json.dumps(header))
+                                    for path, (mtime_ns, size, header) in entries.items()])
+
+
+def get_page_index():
+    """
+    Return the index of the front matter of Grav pages, used by collect_pages.
+
+    The index is created on first use, in the directory returned by get_cache_dir.
+
+    :return: the shared page index
+    :rtype: PageIndex
+    """
+    return get_shared('page_index', PageIndex, get_cache_dir() / 'pages.sqlite3')
+
+
+def set_page_index(page_index):
+    """
+    Replace the shared page index, e.g. to use a temporary index in tests.
+
+    :param page_index: the index to use for all following scans, None to create a new one on next use
+    :type page_index: PageIndex
+    """
+    set_shared('page_index', page_index)
@@ -1,19 +1,45 @@
 import hashlib
 
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_checksums(file_path, algorithms=('sha256', 'sha512'), chunk_size=CHUNK_SIZE):
+    """
+    Get the checksums of a file for several algorithms, reading the file only once.
+
+    :param file_path: path to the file
+    :type file_path: pathlib.Path
+    :param algorithms: names of the hash algorithms, as accepted by hashlib.new
+    :type algorithms: list of str
+    :param chunk_size: size in bytes of the chunks read from the file
+    :type chunk_size: int
+    :return: hex digests of the file, by algorithm
+    :rtype: dict
+    """
+    hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            for m in hashes.values():
+                m.update(view[:size])
+
+    return {algorithm: m.hexdigest() for algorithm, m in hashes.items()}
+
 
 def get_sha256(file_path):
     """
     Get the SHA256 checksum of a file.
     """
-    m = hashlib.sha256()
-    m.update(file_path.read_text().encode())
-    return m.hexdigest()
+    return get_checksums(file_path, ['sha256'])['sha256']
 
 
 def get_sha512(file_path):
     """
     Get the SHA512 checksum of a file.
     """
-    m = hashlib.sha512()
-    m.update(file_path.read_text().encode())
-    return m.hexdigest()
+    return get_checksums(file_path, ['sha512'])['sha512']
@@ -1,32 +1,136 @@
 import argparse
 import inspect
 import os.path
+from importlib import import_module
 from warnings import warn
 
-from facile_rs import (
-    create_bag,
-    create_bagpack,
-    create_cff,
-    create_datacite,
-    create_radar,
-    create_release,
-    create_zenodo,
-    prepare_radar,
-    prepare_release,
-    prepare_zenodo,
-    run_bibtex_pipeline,
-    run_docstring_pipeline,
-    run_markdown_pipeline,
-)
+# Table of the subcommands (platform or metadata type) and their commands. Each command maps to the
+# FACILE-RS script implementing it, the script is only imported when the command is used.
+COMMANDS = {
+    'release': ('Perform operations on CodeMeta metadata', {
+        'prepare': ('prepare_release', 'Update CodeMeta file with the given version and date'),
+    }),
+    'gitlab': ('Perform operations for GitLab releases', {
+        'publish': ('create_release', 'Create a release on GitLab'),
+    }),
+    'radar': ('Perform operations for RADAR releases', {
+        'prepare': ('prepare_radar', 'Prepare a release on RADAR'),
+        'upload': ('create_radar', 'Create a release on RADAR'),
+    }),
+    'zenodo': ('Perform operations for Zenodo releases', {
+        'prepare': ('prepare_zenodo', 'Prepare a release on Zenodo'),
+        'upload': ('create_zenodo', 'Create a release on Zenodo'),
+        'cache': ('manage_zenodo_cache', 'Clear or warm the cache of Zenodo lookups'),
+    }),
+    'cff': ('Generate and manage CFF metadata', {
+        'create': ('create_cff', 'Create a CFF metadata file'),
+    }),
+    'datacite': ('Generate and manage DataCite metadata', {
+        'create': ('create_datacite', 'Create a DataCite metadata file'),
+    }),
+    'bag': ('Generate and manage BagIt bags', {
+        'create': ('create_bag', 'Create a BagIt bag'),
+    }),
+    'bagpack': ('Generate and manage BagPack bags (BagIt with DataCite metadata)', {
+        'create': ('create_bagpack', 'Create a BagIt bag with DataCite metadata'),
+    }),
+    'grav': ('Perform operations for Grav CMS', {
+        'bibtex': ('run_bibtex_pipeline', 'Run the BibTex conversion pipeline'),
+        'docstring': ('run_docstring_pipeline', 'Run the docstring conversion pipeline'),
+        'markdown': ('run_markdown_pipeline', 'Run the Markdown conversion pipeline'),
+    }),
+    'bulk': ('Convert the metadata of many repositories at once', {
+        'convert': ('convert_bulk', 'Create CFF, DataCite, Zenodo and RADAR metadata for many CodeMeta files'),
+    }),
+}
+
+
+def add_http_arguments(parser):
+    """
+    Add the options of the HTTP session shared by all network calls to the parser of a script.
+
+    :param parser: parser of the script
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument('--http-timeout', dest='http_timeout', type=float,
+                        help='Timeout in seconds for HTTP requests (default: 60)')
+    parser.add_argument('--http-pool-size', dest='http_pool_size', type=int,
+                        help='Maximum number of keep-alive connections per host (default: 10)')
+    parser.add_argument('--http-retries', dest='http_retries', type=int,
+                        help='Number of retries for failed connections and idempotent requests (default: 3)')
+
+
+def add_cache_arguments(parser, http=True, lookups=False, pandoc=False):
+    """
+    Add the options of the caches to the parser of a script.
+
+    :param parser: parser of the script
+    :type parser: argparse.ArgumentParser
+    :param http: add the option for the cache of fetched metadata files
+    :type http: bool
+    :param lookups: add the option for the cache of Zenodo lookups
+    :type lookups: bool
+    :param pandoc: add the option for the cache of the pandoc output
+    :type pandoc: bool
+    """
+    parser.add_argument('--cache-dir', dest='cache_dir',
+                        help='Path to the cache directory (default: ~/.cache/facile-rs)')
+    if http:
+        parser.add_argument('--http-cache-size', dest='http_cache_size', type=int,
+                            help='Maximum size in bytes of the cache for fetched metadata files, 0 disables the cache '
+                                 '(default: 67108864)')
+    if lookups:
+        parser.add_argument('--cache-ttl', dest='cache_ttl', type=float,
+                            help='Time in seconds after which cached Zenodo lookups expire, 0 disables the cache '
+                                 '(default: 604800)')
+    if pandoc:
+        parser.add_argument('--pandoc-cache-size', dest='pandoc_cache_size', type=int,
+                            help='Maximum size in bytes of the cache for the pandoc output, 0 disables the cache '
+                                 '(default: 67108864)')
+
+
+def add_fetch_arguments(parser, strategies):
+    """
+    Add the options for fetching and staging assets to the parser of a script.
+
+    :param parser: parser of the script
+    :type parser: argparse.ArgumentParser
+    :param strategies: staging strategies allowed for the script, see facile_rs.utils.http.STAGING_STRATEGIES
+    :type strategies: list
+    """
+    parser.add_argument('--staging-strategy', dest='staging_strategy', choices=strategies,
+                        help='How local assets are staged: {} (default: copy). Falls back to copy '
+                             'if the assets are on another file system.'.format(', '.join(strategies)))
+    parser.add_argument('--fetch-workers', dest='fetch_workers', type=int,
+                        help='Maximum number of assets fetched at the same time (default: 4)')
+    parser.add_argument('--fetch-chunk-size', dest='fetch_chunk_size', type=int,
+                        help='Size in bytes of the chunks written to disk when downloading assets (default: 1048576)')
+
+
+def import_script(module_name):
+    """
+    Import a FACILE-RS script.
+
+    :param module_name: name of the module in the facile_rs package, e.g. create_cff
+    :type module_name: str
+    :return: the imported module
+    """
+    return import_module(f'facile_rs.{module_name}')
 
 
 # create the top-level parser
-def create_parser():
+def create_parser(command=None):
     """
     Create parsers for the facile-rs command line interface.
     The main parser has one subparser per platform (Zenodo, RADAR, ...) or metadata type (CFF, DataCite,...).
     Each of this subparser has a subparser per FACILE-RS script.
 
+    The subparsers are created from COMMANDS. If command is given, only the script of this command is
+    imported and only its subparser gets the options of the script, the other subparsers only get their help.
+    Otherwise all scripts are imported, e.g. to document the complete command line interface.
+
+    :param command: None or (subcommand, command) tuple, e.g. ('cff', 'create')
+    :type command: None or tuple
     :return: The parser object.
     """
     # Main parser
@@ -39,109 +143,32 @@ def create_parser():
     subparsers = parser.add_subparsers(help='Select the target platform or metadata type.',
                                        dest='subcommand')
 
-    # Parser for the 'release' subcommand
-    parser_release = subparsers.add_parser('release', help='Perform operations on CodeMeta metadata')
-    release_subparsers = parser_release.add_subparsers()
-    parser_release_prepare = release_subparsers.add_parser('prepare',
-                                                           help='Update CodeMeta file with the given version and date',
-                                                           parents=[prepare_release.create_parser(add_help=False)],
-                                                           add_help=True)
-    parser_release_prepare.set_defaults(func=prepare_release.main)
-
-    # Parser for the 'gitlab' subcommand
-    parser_gitlab = subparsers.add_parser('gitlab', help='Perform operations for GitLab releases')
-    gitlab_subparsers = parser_gitlab.add_subparsers()
-    parser_gitlab_publish = gitlab_subparsers.add_parser('publish',
-                                                        parents=[create_release.create_parser(add_help=False)],
-                                                        help="Create a release on GitLab",
-                                                        add_help=True)
-    parser_gitlab_publish.set_defaults(func=create_release.main)
-
-    # Parser for the 'radar' subcommand
-    parser_radar = subparsers.add_parser('radar', help='Perform operations for RADAR releases')
-    radar_subparsers = parser_radar.add_subparsers()
-    parser_radar_prepare = radar_subparsers.add_parser('prepare',
-                                                       help='Prepare a release on RADAR',
-                                                       parents=[prepare_radar.create_parser(add_help=False)],
-                                                       add_help=True)
-    parser_radar_prepare.set_defaults(func=prepare_radar.main)
-    parser_radar_upload = radar_subparsers.add_parser('upload',
-                                                      help='Create a release on RADAR',
-                                                      parents=[create_radar.create_parser(add_help=False)],
-                                                      add_help=True)
-    parser_radar_upload.set_defaults(func=create_radar.main)
-
-    # Parser for the 'zenodo' subcommand
-    parser_zenodo = subparsers.add_parser('zenodo', help='Perform operations for Zenodo releases')
-    zenodo_subparsers = parser_zenodo.add_subparsers()
-    parser_zenodo_prepare = zenodo_subparsers.add_parser('prepare',
-                                                        help='Prepare a release on Zenodo',
-                                                        parents=[prepare_zenodo.create_parser(add_help=False)],
-                                                        add_help=True)
-    parser_zenodo_prepare.set_defaults(func=prepare_zenodo.main)
-    parser_zenodo_upload = zenodo_subparsers.add_parser('upload',
-                                                        help='Create a release on Zenodo',
-                                                        parents=[create_zenodo.create_parser(add_help=False)],
-                                                        add_help=True)
-    parser_zenodo_upload.set_defaults(func=create_zenodo.main)
-
-    # Parser for the 'cff' subcommand
-    parser_cff = subparsers.add_parser('cff', help='Generate and manage CFF metadata')
-    cff_subparsers = parser_cff.add_subparsers()
-    parser_cff_create = cff_subparsers.add_parser('create',
-                                                  help='Create a CFF metadata file',
-                                                  parents=[create_cff.create_parser(add_help=False)],
-                                                  add_help=True)
-    parser_cff_create.set_defaults(func=create_cff.main)
-
-    # Parser for the 'datacite' subcommand
-    parser_datacite = subparsers.add_parser('datacite', help='Generate and manage DataCite metadata')
-    datacite_subparsers = parser_datacite.add_subparsers()
-    parser_datacite_create = datacite_subparsers.add_parser('create',
-                                                            help='Create a DataCite metadata file',
-                                                            parents=[create_datacite.create_parser(add_help=False)],
-                                                            add_help=True)
-    parser_datacite_create.set_defaults(func=create_datacite.main)
-
-    # Parser for the 'bag' subcommand
-    parser_bag = subparsers.add_parser('bag', help='Generate and manage BagIt bags')
-    bag_subparsers = parser_bag.add_subparsers()
-    parser_bag_create = bag_subparsers.add_parser('create',
-                                                  help='Create a BagIt bag',
-                                                  parents=[create_bag.create_parser(add_help=False)],
-                                                  add_help=True)
-    parser_bag_create.set_defaults(func=create_bag.main)
-
-    # Parser for the 'bagpack' subcommand
-    parser_bagpack = subparsers.add_parser('bagpack',
-                                           help='Generate and manage BagPack bags (BagIt with DataCite metadata)')
-    bagpack_subparsers = parser_bagpack.add_subparsers()
-    parser_bagpack_create = bagpack_subparsers.add_parser('create',
-                                                          help='Create a BagIt bag with DataCite metadata',
-                                                          parents=[create_bagpack.create_parser(add_help=False)],
-                                                          add_help=True)
-    parser_bagpack_create.set_defaults(func=create_bagpack.main)
-
-    # Parser for the 'grav' subcommand
-    parser_grav = subparsers.add_parser('grav', help='Perform operations for Grav CMS')
-    grav_subparsers = parser_grav.add_subparsers()
-    parser_grav_bibtex = grav_subparsers.add_parser('bibtex',
-                                                    help='Run the BibTex conversion pipeline',
-                                                    parents=[run_bibtex_pipeline.create_parser(add_help=False)],
-                                                    add_help=True)
-    parser_grav_bibtex.set_defaults(func=run_bibtex_pipeline.main)
-
-    parser_grav_docstring = grav_subparsers.add_parser('docstring',
-                                                         help='Run the docstring conversion pipeline',
-                                                         parents=[run_docstring_pipeline.create_parser(add_help=False)],
-                                                         add_help=True)
-    parser_grav_docstring.set_defaults(func=run_docstring_pipeline.main)
-
-    parser_grav_markdown = grav_subparsers.add_parser('markdown',
-                                                        help='Run the Markdown conversion pipeline',
-                                                        parents=[run_markdown_pipeline.create_parser(add_help=False)],
-                                                        add_help=True)
-    parser_grav_markdown.set_defaults(func=run_markdown_pipeline.main)
+    for subcommand_name, (subcommand_help, commands) in COMMANDS.items():
+        parser_subcommand = subparsers.add_parser(subcommand_name, help=subcommand_help)
+        command_subparsers = parser_subcommand.add_subparsers()
+
+        for command_name, (module_name, command_help) in commands.items():
+            if command is None or tuple(command) == (subcommand_name, command_name):
+                script = import_script(module_name)
+                parser_command = command_subparsers.add_parser(command_name,
+                                                               help=command_help,
+                                                               parents=[script.create_parser(add_help=False)],
+                                                               add_help=True)
+                parser_command.set_defaults(func=script.main, command_depth=2)
+            else:
+                command_subparsers.add_parser(command_name, help=command_help)
+
+    # Parser for the 'run' subcommand, which has no commands of its own
+    if command is None or tuple(command[:1]) == ('run', ):
+        run_manifest = import_script('run_manifest')
+        parser_run = subparsers.add_parser('run',
+                                           help='Run a sequence of commands from a manifest file in one process',
+                                           parents=[run_manifest.create_parser(add_help=False)],
+                                           add_help=True)
+        parser_run.set_defaults(func=run_manifest.main, command_depth=1)
+    else:
+        subparsers.add_parser('run', help='Run a sequence of commands from a manifest file in one process')
+
     return parser
 
 
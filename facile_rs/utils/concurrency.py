@@ -0,0 +1,52 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__file__)
+
+
+def get_default_processes():
+    """
+    Get the number of CPUs available to the current process.
+
+    :return: number of CPUs
+    :rtype: int
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def map_concurrently(func, items, workers, error_message, label=str):
+    """
+    Call a function for all items using a pool of worker threads and return the results in the order of the items.
+
+    If some of the calls fail, the errors are logged in the order of the items and a RuntimeError is raised once
+    all workers are done, so that the error reporting does not depend on the scheduling of the workers.
+
+    :param func: function called with each item as single argument
+    :param items: items to process
+    :type items: list
+    :param workers: maximum number of items processed at the same time
+    :type workers: int
+    :param error_message: message of the RuntimeError, formatted with the comma-separated labels of the failed items
+    :type error_message: str
+    :param label: function returning the label of an item used in the error messages
+    :return: results of the calls, in the order of the items
+    :rtype: list
+    """
+    with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as executor:
+        futures = [executor.submit(func, item) for item in items]
+
+    errors = []
+    for item, future in zip(items, futures):
+        exception = future.exception()
+        if exception is not None:
+            logger.error('%s: %s', label(item), exception)
+            errors.append((item, exception))
+
+    if errors:
+        raise RuntimeError(error_message.format(', '.join(label(item) for item, _ in errors))) from errors[0][1]
+
+    return [future.result() for future in futures]
@@ -1,16 +1,77 @@
 import logging
 import os
+import re
 from pathlib import Path
 
 import frontmatter
+import yaml
+
+from .cache import get_page_index
 
 logger = logging.getLogger(__file__)
 
+BOUNDARY_PATTERN = re.compile(r'^-{3,}\s*$')
+
+
+def read_header(file_path):
+    """
+    Read the YAML front matter of a GRAV page, without reading the rest of the file.
+
+    :param file_path: path to the GRAV page
+    :type file_path: pathlib.Path
+    :return: the front matter, or an empty dict if the page has none
+    :rtype: dict
+    """
+    with open(file_path, encoding='utf-8-sig') as fp:
+        # skip leading blank lines, like frontmatter.load
+        for line in fp:
+            if line.strip():
+                break
+        else:
+            return {}
+
+        if not BOUNDARY_PATTERN.match(line):
+            return {}
+
+        lines = []
+        for line in fp:
+            if BOUNDARY_PATTERN.match(line):
+                header = yaml.safe_load(''.join(lines))
+                return header if isinstance(header, dict) else {}
+            lines.append(line)
+
+    # the front matter is not closed
+    return {}
+
+
+def scan_pages(path):
+    """
+    Yield the markdown files below a directory, using os.scandir, in the same order as os.walk
+    (symbolic links to directories are not followed).
+
+    :param path: path to the directory
+    :type path: str
+    :return: generator of os.DirEntry objects
+    """
+    dirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.name.endswith('.md') and entry.is_file():
+                yield entry
+
+    for dir_path in dirs:
+        yield from scan_pages(dir_path)
+
 
 def collect_pages(grav_path, pipeline_name):
     """
     Collect pages in a GRAV repository which are associated with the given pipeline name.
 
+    Only the front matter of the pages is read, and pages which did not change since the last scan
+    are looked up in the page index. Only the pages of the pipeline are loaded completely.
+
     :param grav_path: path to the GRAV repository
     :type grav_path: string representing a path segment, or an object implementing the os.PathLike interface
     :param pipeline_name: name of the pipeline
@@ -19,21 +80,81 @@ def collect_pages(grav_path, pipeline_name):
     :rtype: list
     """
     pages_path = Path(grav_path).expanduser() / 'pages'
+    if not pages_path.is_dir():
+        return []
+
+    # the front matter of pages which did not change since the last scan is taken from the index
+    page_index = get_page_index()
+    index_path = pages_path.absolute()
+    index = page_index.get_all(index_path)
 
-    # walk the grav repo to find the files with `pipeline: carputils`
+    # scan the grav repo to find the files with `pipeline: carputils`
     pages = []
-    for root, dirs, files in os.walk(pages_path):
-        for file_name in files:
-            file_path = Path(root) / file_name
-            if file_path.suffix == '.md' and file_path.stem not in ['modular']:
+    entries = {}
+    for entry in scan_pages(pages_path):
+        file_path = Path(entry.path)
+        if file_path.stem not in ['modular']:
+            key = str(index_path / file_path.relative_to(pages_path))
+            stat = entry.stat()
+            try:
+                mtime_ns, size, header = index[key]
+                if (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+                    raise KeyError(key)
+            except KeyError:
+                logger.debug('read header of %s', file_path)
+                header = {
+                    name: value if isinstance(value, str) else None
+                    for name, value in read_header(file_path).items()
+                    if name in ['pipeline', 'source']
+                }
+
+            entries[key] = (stat.st_mtime_ns, stat.st_size, header)
+
+            if header.get('pipeline') == pipeline_name:
                 try:
                     page = frontmatter.load(file_path)
-                    if page.get('pipeline') == pipeline_name:
-                        logger.debug('file_path = %s', file_path)
-                        pages.append((file_path, page, page.get('source')))
+                    logger.debug('file_path = %s', file_path)
+                    pages.append((file_path, page, page.get('source')))
 
                 except TypeError:
                     # if a file has issues with the metadata, just ignore it
                     pass
 
+    if entries != index:
+        page_index.set_all(index_path, entries)
+
     return pages
+
+
+def write_page(page_path, content):
+    """
+    Write the content of a page, unless the file already has exactly this content, so that
+    unchanged pages keep their modification time.
+
+    :param page_path: path to the page file
+    :type page_path: pathlib.Path
+    :param content: content of the page
+    :type content: str
+    :return: True if the file was written, False if it was unchanged
+    :rtype: bool
+    """
+    try:
+        if page_path.read_text() == content:
+            logger.debug('%s is unchanged', page_path)
+            return False
+    except FileNotFoundError:
+        pass
+
+    logger.info('writing to %s', page_path)
+    page_path.write_text(content)
+    return True
+
+
+def report_pages(written):
+    """
+    Log how many pages were written and how many were unchanged.
+
+    :param written: results of write_page
+    :type written: list
+    """
+    logger.info('%s pages written, %s pages unchanged', written.count(True), written.count(False))
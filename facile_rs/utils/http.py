@@ -1,57 +1,455 @@
+import copy
+import errno
+import hashlib
+import io
 import json
 import logging
+import os
 import shutil
+import threading
+import uuid
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlsplit, urlunsplit
 
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import settings
+from .cache import get_http_cache
+from .checksum import get_checksums
+from .concurrency import map_concurrently
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 logger = logging.getLogger(__file__)
 
+HTTP_TIMEOUT = 60
+HTTP_POOL_SIZE = 10
+HTTP_RETRIES = 3
+
+FETCH_WORKERS = 4
+FETCH_CHUNK_SIZE = 1024 * 1024
+
+STAGING_STRATEGIES = ['copy', 'hardlink', 'reflink', 'symlink', 'move']
+
+# ioctl request to share the data blocks of two files on copy-on-write file systems (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+_session = None
+_session_options = None
+_session_lock = threading.Lock()
+_documents = {}
+
+
+class Session(requests.Session):
+
+    """A requests session which applies a default timeout to every request"""
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE, pool_connections=HTTP_POOL_SIZE,
+                   pool_block=False, retries=HTTP_RETRIES, keep_alive=True):
+    """Create a session with a pool of keep-alive connections.
+
+    :param timeout: default timeout in seconds for every request, None to wait forever
+    :type timeout: float
+    :param pool_size: maximum number of connections kept open per host
+    :type pool_size: int
+    :param pool_connections: number of hosts for which a connection pool is kept
+    :type pool_connections: int
+    :param pool_block: block when all connections to a host are in use, instead of opening a new one
+    :type pool_block: bool
+    :param retries: number of retries for failed connections and idempotent requests
+    :type retries: int
+    :param keep_alive: keep connections open between requests
+    :type keep_alive: bool
+    :return: the configured session
+    :rtype: Session
+    """
+    session = Session(timeout=timeout)
+
+    # only retry requests which can be safely sent twice, POST and PUT bodies might be streamed from files
+    max_retries = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                        allowed_methods=['HEAD', 'GET', 'OPTIONS'], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_size,
+                          pool_block=pool_block, max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+def get_session():
+    """Return the session shared by all network calls of FACILE-RS.
+
+    The session is created on first use, using HTTP_TIMEOUT, HTTP_POOL_SIZE and HTTP_RETRIES from the settings,
+    and is then reused for all following calls in the same process. When these settings change, e.g. between
+    the steps of facile-rs run, a new session is created. A session given with set_session is always kept.
+
+    :return: the shared session
+    :rtype: requests.Session
+    """
+    global _session, _session_options
+
+    timeout = getattr(settings, 'HTTP_TIMEOUT', None)
+    timeout = float(timeout) if timeout else HTTP_TIMEOUT
+    pool_size = getattr(settings, 'HTTP_POOL_SIZE', None)
+    pool_size = int(pool_size) if pool_size else HTTP_POOL_SIZE
+    retries = getattr(settings, 'HTTP_RETRIES', None)
+    retries = int(retries) if retries is not None else HTTP_RETRIES
+    options = {'timeout': timeout, 'pool_size': pool_size, 'retries': retries}
+
+    # the first calls might come from several worker threads at the same time
+    with _session_lock:
+        if _session is None or _session_options not in [None, options]:
+            if _session is not None:
+                _session.close()
+
+            logger.debug('timeout = %s, pool_size = %s, retries = %s', timeout, pool_size, retries)
+            _session = create_session(**options)
+            _session_options = options
+
+        return _session
+
+
+def get_upload_timeout():
+    """Return the timeout for requests with a large body, e.g. file uploads: the default timeout of the
+    shared session to connect, but no timeout to read the response, since the server might take a long time
+    to process the body before it answers.
+
+    :return: a tuple (connect timeout, read timeout)
+    :rtype: tuple
+    """
+    return (getattr(get_session(), 'timeout', HTTP_TIMEOUT), None)
+
+
+def set_session(session):
+    """Replace the shared session, e.g. to inject a custom or mocked session in tests.
+
+    :param session: the session to use for all following network calls, None to create a new one on next use
+    :type session: requests.Session
+    """
+    global _session, _session_options
+
+    with _session_lock:
+        _session = session
+        _session_options = None
+
+
+def close_session():
+    """Close the connections of the shared session and discard it."""
+    global _session, _session_options
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _session_options = None
+
+
+class MultipartFile:
+
+    """A multipart/form-data request body with a single file field, which is read from disk while it is sent"""
+
+    def __init__(self, field_name, file_path):
+        """Open the file and prepare the multipart envelope around it.
+
+        :param field_name: name of the form field
+        :type field_name: str
+        :param file_path: path to the file
+        :type file_path: pathlib.Path
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+
+        file_name = Path(file_path).name.replace('"', '%22')
+        head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+        self.file = open(file_path, 'rb')
+        self.parts = [io.BytesIO(head), self.file, io.BytesIO(tail)]
+        self.length = len(head) + os.fstat(self.file.fileno()).st_size + len(tail)
+        self.bytes_read = 0
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, size=-1):
+        chunks = []
+        while self.parts and (size < 0 or size > 0):
+            chunk = self.parts[0].read(size)
+            if not chunk:
+                self.parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+
+        data = b''.join(chunks)
+        self.bytes_read += len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def reflink_file(source, target):
+    """Copy a file by sharing its data blocks if the file system supports it (reflink).
+
+    Falls back to copy_file_range, which lets the kernel copy the data without passing it through
+    user space, and to a regular copy if neither is available.
+
+    :param source: path to the source file
+    :param target: path to the target file
+    """
+    with open(source, 'rb') as fsrc, open(target, 'wb') as fdst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), FETCH_CHUNK_SIZE * 64):
+                    pass
+                return
+            except OSError:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+
+        shutil.copyfileobj(fsrc, fdst)
+
+
+def stage_file(location, target, strategy='copy'):
+    """Put a local file at the given target, using the given strategy.
+
+    The strategies hardlink and move fall back to a copy if the target is on another file system
+    or if the file system does not support them.
+
+    :param location: path to the file
+    :type location: str
+    :param target: path where the file should be staged
+    :type target: pathlib.Path
+    :param strategy: one of STAGING_STRATEGIES
+    :type strategy: str
+    """
+    if strategy == 'copy':
+        shutil.copyfile(location, target)
+
+    elif strategy == 'hardlink':
+        try:
+            os.link(location, target)
+        except OSError as e:
+            if e.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP]:
+                raise
+            logger.info('cannot hardlink %s (%s), copying it instead', location, e.strerror)
+            shutil.copyfile(location, target)
+
+    elif strategy == 'reflink':
+        reflink_file(location, target)
+
+    elif strategy == 'symlink':
+        os.symlink(Path(location).expanduser().resolve(), target)
+
+    elif strategy == 'move':
+        try:
+            os.rename(location, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            logger.info('cannot move %s to another file system, copying it instead', location)
+            shutil.move(location, target)
+
+    else:
+        raise ValueError(f'Unknown staging strategy {strategy}, use one of {", ".join(STAGING_STRATEGIES)}.')
+
+
+def fetch_file(location, target, chunk_size=FETCH_CHUNK_SIZE, algorithms=None, strategy='copy'):
+    """Fetch a file from a local location or a URL and save it at the given target.
+
+    Downloads are streamed in chunks to a temporary file next to the target, which is renamed
+    to the target once the download is complete. Local files are staged using the given strategy.
+    If algorithms are given, the checksums of the file are computed from the same chunks while they are written.
+
+    :param location: URL or path to the file
+    :type location: str
+    :param target: path where the file should be saved
+    :type target: pathlib.Path
+    :param chunk_size: size in bytes of the chunks written to disk
+    :type chunk_size: int
+    :param algorithms: names of the hash algorithms, as accepted by hashlib.new
+    :type algorithms: list of str
+    :param strategy: how local files are staged, one of STAGING_STRATEGIES
+    :type strategy: str
+    :return: hex digests of the file, by algorithm
+    :rtype: dict
+    """
+    logger.debug('location = %s, target = %s', location, target)
+
+    hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms or []}
 
-def fetch_files(locations, path):
+    if urlparse(location).scheme:
+        with get_session().get(location, stream=True) as response:
+            response.raise_for_status()
+
+            # unlike tempfile.mkstemp, open creates the file with the permissions given by the umask
+            tmp_path = target.parent / f'.{target.name}.{uuid.uuid4().hex}.part'
+            f = open(tmp_path, 'xb')
+            try:
+                with f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        for m in hashes.values():
+                            m.update(chunk)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    elif hashes and strategy == 'copy':
+        with open(location, 'rb') as fsrc, open(target, 'wb') as fdst:
+            for chunk in iter(lambda: fsrc.read(chunk_size), b''):
+                fdst.write(chunk)
+                for m in hashes.values():
+                    m.update(chunk)
+
+    else:
+        stage_file(location, target, strategy)
+
+        # the data was not copied, so it needs to be read once to be hashed
+        if hashes:
+            return get_checksums(target, hashes.keys(), chunk_size)
+
+    return {algorithm: m.hexdigest() for algorithm, m in hashes.items()}
+
+
+def fetch_files(locations, path, workers=None, chunk_size=None, algorithms=None, strategy=None):
     """Fetch files from local locations or a URLs and save them at the given path.
 
+    The files are fetched concurrently by a pool of workers. If some of the files could not be fetched,
+    the errors are logged in the order of the locations and a RuntimeError is raised once all workers are done.
+
     :param locations: list of URL or paths to the files
     :type location: list of str
     :param path: location where the files should be saved
-    :type path: str
+    :type path: pathlib.Path
+    :param workers: maximum number of files fetched at the same time (default: FETCH_WORKERS)
+    :type workers: int
+    :param chunk_size: size in bytes of the chunks written to disk for downloads (default: FETCH_CHUNK_SIZE)
+    :type chunk_size: int
+    :param algorithms: names of the hash algorithms for which the checksums are computed while fetching
+    :type algorithms: list of str
+    :param strategy: how local files are staged, one of STAGING_STRATEGIES (default: copy)
+    :type strategy: str
+    :return: hex digests of the fetched files by algorithm, by target path
+    :rtype: dict
     """
+    workers = int(workers) if workers else FETCH_WORKERS
+    chunk_size = int(chunk_size) if chunk_size else FETCH_CHUNK_SIZE
+    strategy = strategy or 'copy'
+    if strategy not in STAGING_STRATEGIES:
+        raise ValueError(f'Unknown staging strategy {strategy}, use one of {", ".join(STAGING_STRATEGIES)}.')
+
+    # if two locations have the same file name, the last one wins
+    targets = {}
     for location in locations:
         target = path / location.split('/')[-1]
+        if target in targets:
+            logger.warning('%s overrides %s', location, targets.pop(target))
+        targets[target] = location
 
-        logger.debug('location = %s, target = %s', location, target)
+    results = map_concurrently(lambda item: fetch_file(item[1], item[0], chunk_size, algorithms, strategy),
+                               list(targets.items()), workers, 'Could not fetch {}.', label=lambda item: item[1])
 
-        if urlparse(location).scheme:
-            response = requests.get(location)
-            response.raise_for_status()
-            with open(target, 'wb') as f:
-                f.write(response.content)
+    return dict(zip(targets, results))
 
-        else:
-            shutil.copyfile(location, target)
+
+def clear_documents():
+    """Discard the documents parsed by fetch_dict, so that they are fetched and parsed again."""
+    _documents.clear()
+
+
+def get_document_key(location):
+    """Return the key of a document in the parsed documents: the normalized URL (lower case scheme and host,
+    without fragment), or the resolved path, modification time and size of a local file.
+    None is returned if the file does not exist.
+    """
+    parsed_url = urlsplit(location)
+    if parsed_url.scheme:
+        return urlunsplit((parsed_url.scheme.lower(), parsed_url.netloc.lower(), parsed_url.path or '/',
+                           parsed_url.query, ''))
+
+    try:
+        path = Path(location).expanduser().resolve()
+        stat = path.stat()
+    except OSError:
+        return None
+    return (str(path), stat.st_mtime_ns, stat.st_size)
 
 
 def fetch_dict(location):
     """Fetch data from a JSON or YAML file and return it as a dictionary.
 
+    Remote files are fetched with fetch_text, which uses the HTTP cache. The parsed documents are kept
+    in memory for the lifetime of the process, so that a location is only fetched and parsed once,
+    unless a local file was modified in between. Each call returns a copy, which can be modified freely.
+
     :param location: URL or path to the file (allowed extensions: .json, .yml, .yaml)
     :type location: str
     :return: Dictionary containing file data
     :rtype: dict
     """
+    key = get_document_key(location)
+    if key is None:
+        return parse_dict(location)
+
+    if key in _documents:
+        logger.debug('reuse %s', location)
+    else:
+        _documents[key] = parse_dict(location)
+
+    return copy.deepcopy(_documents[key])
+
+
+def parse_dict(location):
+    """Fetch and parse a JSON or YAML file, see fetch_dict."""
     parsed_url = urlparse(location)
     if parsed_url.scheme:
         logger.debug('location = %s', location)
 
-        response = requests.get(location)
-        response.raise_for_status()
+        text = fetch_text(location)
 
         if parsed_url.path.endswith('.json'):
-            return json.loads(response.text)
+            return json.loads(text)
         elif parsed_url.path.endswith('.yml') or parsed_url.path.endswith('.yaml'):
-            return yaml.safe_load(response.text)
+            return yaml.safe_load(text)
         else:
             raise RuntimeError('{} is not a JSON or YAML file.')
     else:
@@ -65,14 +463,77 @@ def fetch_dict(location):
                 raise RuntimeError('{} is not a JSON or YAML file.')
 
 
+def fetch_dicts(locations, workers=None):
+    """Fetch data from several JSON or YAML files concurrently, see fetch_dict.
+
+    Each distinct location is only fetched once, even if it is given several times. If some of the files
+    could not be fetched, the errors are logged in the order of the locations and a RuntimeError is raised.
+
+    :param locations: list of URL or paths to the files
+    :type locations: list
+    :param workers: maximum number of files fetched at the same time (default: FETCH_WORKERS)
+    :type workers: int
+    :return: dictionaries containing the file data, in the order of the locations
+    :rtype: list
+    """
+    workers = int(workers) if workers else FETCH_WORKERS
+
+    unique_locations = list(dict.fromkeys(locations))
+    results = dict(zip(unique_locations,
+                       map_concurrently(fetch_dict, unique_locations, workers, 'Could not fetch {}.')))
+
+    # repeated locations get their own copy, so that the data can be modified independently
+    data = []
+    for i, location in enumerate(locations):
+        data.append(copy.deepcopy(results[location]) if location in locations[:i] else results[location])
+    return data
+
+
+def fetch_text(location, headers=None):
+    """Fetch the body of a response from a URL, using the HTTP cache.
+
+    If a response with an ETag or Last-Modified header is in the cache, a conditional request
+    (If-None-Match or If-Modified-Since) is sent and the cached body is used if the server answers with 304.
+
+    :param location: URL to fetch
+    :type location: str
+    :param headers: additional request headers
+    :type headers: dict
+    :return: decoded body of the response
+    :rtype: str
+    """
+    headers = dict(headers or {})
+    key = ' '.join([location, headers.get('Accept', '')]).strip()
+
+    http_cache = get_http_cache()
+    cached = http_cache.get(key)
+    if cached is not None:
+        etag, last_modified, content = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    response = get_session().get(location, headers=headers)
+    if cached is not None and response.status_code == 304:
+        logger.debug('not modified %s', location)
+        return content
+
+    response.raise_for_status()
+
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if (etag or last_modified) and 'no-store' not in response.headers.get('Cache-Control', ''):
+        http_cache.set(key, etag, last_modified, response.text)
+
+    return response.text
+
+
 def fetch_json(location):
     """
-    Fetch JSON data from the given location.
+    Fetch JSON data from the given location, using the HTTP cache (see fetch_text).
 
     :param location: URL to the JSON data
     :type location: str
     :return: JSON-encoded response
     """
-    response = requests.get(location, headers={'Accept': 'application/json'})
-    response.raise_for_status()
-    return response.json()
+    return json.loads(fetch_text(location, headers={'Accept': 'application/json'}))
@@ -1,7 +1,7 @@
 import json
 import logging
 
-from ..http import fetch_dict
+from ..http import fetch_dict, fetch_dicts
 
 logger = logging.getLogger(__file__)
 
@@ -23,11 +23,14 @@ class CodemetaMetadata:
         if location:
             self.data.update(fetch_dict(location))
 
-    def fetch_authors(self, locations):
-        """Fetch authors from CodeMeta files and update metadata set
+    def fetch_authors(self, locations, workers=None):
+        """Fetch authors from CodeMeta files and update metadata set. The files are fetched concurrently,
+        the authors are added in the order of the locations.
 
         :param locations: list of URL or paths to CodeMeta files
         :param locations: list
+        :param workers: maximum number of files fetched at the same time (default: FETCH_WORKERS)
+        :type workers: int
         """
         if locations:
             if 'author' not in self.data:
@@ -35,14 +38,17 @@ class CodemetaMetadata:
             # Case when there is a unique author not contained in a list
             elif isinstance(self.data['author'], dict):
                 self.data['author'] = [self.data['author']]
-            for location in locations:
-                self.data['author'] += fetch_dict(location).get('author', [])
+            for data in fetch_dicts(locations, workers):
+                self.data['author'] += data.get('author', [])
 
-    def fetch_contributors(self, locations):
-        """Fetch contributors from CodeMeta files and update metadata set
+    def fetch_contributors(self, locations, workers=None):
+        """Fetch contributors from CodeMeta files and update metadata set. The files are fetched concurrently,
+        the contributors are added in the order of the locations.
 
         :param locations: list of URL or paths to CodeMeta files
         :param locations: list
+        :param workers: maximum number of files fetched at the same time (default: FETCH_WORKERS)
+        :type workers: int
         """
         if locations:
             if 'contributor' not in self.data:
@@ -50,8 +56,8 @@ class CodemetaMetadata:
             # Case when there is a unique contributor not contained in a list
             elif isinstance(self.data['contributor'], dict):
                 self.data['contributor'] = [self.data['contributor']]
-            for location in locations:
-                self.data['contributor'] += fetch_dict(location).get('contributor', [])
+            for data in fetch_dicts(locations, workers):
+                self.data['contributor'] += data.get('contributor', [])
 
     def compute_names(self):
         """Add full name of authors and contributors in metadata set from given name and family name,
@@ -1,6 +1,7 @@
 import json
 from os import path
 
+from facile_rs.utils import http
 from facile_rs.utils.metadata import CodemetaMetadata
 
 # Get current script location
@@ -30,6 +31,31 @@ def test_fetch_authors():
             assert author in metadata.data['author']
 
 
+def test_fetch_authors_concurrently(monkeypatch):
+    """Test that authors are merged in the order of the locations and that repeated locations are fetched once.
+    """
+    fetched = []
+
+    def fetch_dict(location):
+        fetched.append(location)
+        return {'author': [{'name': location}]}
+
+    monkeypatch.setattr(http, 'fetch_dict', fetch_dict)
+
+    metadata = CodemetaMetadata()
+    metadata.fetch_authors(['https://example.org/a.json', 'https://example.org/b.json',
+                            'https://example.org/a.json', 'https://example.org/c.json'], workers=4)
+    assert [author['name'] for author in metadata.data['author']] == [
+        'https://example.org/a.json', 'https://example.org/b.json',
+        'https://example.org/a.json', 'https://example.org/c.json'
+    ]
+    assert sorted(fetched) == ['https://example.org/a.json', 'https://example.org/b.json', 'https://example.org/c.json']
+
+    # repeated locations get their own copy of the data
+    metadata.data['author'][0]['email'] = 'a@example.org'
+    assert 'email' not in metadata.data['author'][2]
+
+
 def test_fetch_contributors():
     """Test fetching contributors when initial dataset contains a unique contributor
     """
@@ -1,5 +1,6 @@
 from os import path
 
+from facile_rs.utils.cache import Cache, set_cache
 from facile_rs.utils.metadata import ZenodoMetadata
 
 # Get current script location
@@ -14,6 +15,18 @@ def test_get_license_id_from_spdx():
     assert metadata.get_license_id_from_spdx("not-a-license") is None
 
 
+def test_get_license_id_from_spdx_offline(mock_session):
+    def handler(method, url, **kwargs):
+        raise AssertionError('the Zenodo API should not be queried')
+
+    mock_session(handler)
+
+    metadata = ZenodoMetadata()
+    assert metadata.get_license_id_from_spdx("MIT") == "mit"
+    assert metadata.get_license_id_from_spdx("Apache-2.0") == "apache-2.0"
+    assert metadata.to_rights("https://spdx.org/licenses/MIT") == {"id": "mit"}
+
+
 def test_to_person_or_org():
     metadata = ZenodoMetadata()
     codemeta_person = {
@@ -280,3 +293,58 @@ def test_add_to_array_field():
     assert len(zenodo_dict['metadata'][field]) == 2
     assert value1 in zenodo_dict['metadata'][field]
     assert value2 in zenodo_dict['metadata'][field]
+
+
+def test_resolve_lookups(mock_session, tmp_path):
+    def handler(method, url, params=None):
+        if url.endswith('/awards') and params == {'q': 'number:955495'}:
+            return {'hits': {'total': 1, 'hits': [
+                {'id': '00k4n6c32::955495', 'funder': {'id': '00k4n6c32'}}
+            ]}}
+        return (None, 404)
+
+    session = mock_session(handler)
+    set_cache(Cache(tmp_path / 'cache.sqlite3', ttl=0))
+
+    metadata = ZenodoMetadata({
+        "license": ["MIT", "not-a-license", {"name": "not-a-license"}],
+        "funding": [
+            {"identifier": "955495", "funder": {"@id": "https://ror.org/00k4n6c32"}},
+            {"identifier": "955495"},
+            {"identifier": "nonvalid1234", "name": "The grant name", "funder": {"name": "The funder"}},
+            {"identifier": "nonvalid5678", "funder": "https://ror.org/04t3en479"}
+        ]
+    })
+    zenodo_dict = metadata.as_dict()
+
+    # every unique query is sent once, licenses in the bundled index are not queried, and funders are only
+    # queried for fundings whose award could not be validated, after the awards were queried
+    requests = [(url, kwargs.get('params')) for method, url, kwargs in session.requests]
+    assert sorted(requests[:4], key=str) == sorted([
+        ('https://zenodo.org/api/vocabularies/licenses/not-a-license', None),
+        ('https://zenodo.org/api/awards', {'q': 'number:955495'}),
+        ('https://zenodo.org/api/awards', {'q': 'number:nonvalid1234'}),
+        ('https://zenodo.org/api/awards', {'q': 'number:nonvalid5678'}),
+    ], key=str)
+    assert requests[4:] == [('https://zenodo.org/api/funders', {'q': 'id:04t3en479'})]
+    assert zenodo_dict['metadata']['rights'] == [{'id': 'mit'}, {'title': {'en': 'not-a-license'}}]
+    assert zenodo_dict['metadata']['funding'] == [
+        {'award': {'id': '00k4n6c32::955495'}, 'funder': {'id': '00k4n6c32'}},
+        {'award': {'id': '00k4n6c32::955495'}, 'funder': {'id': '00k4n6c32'}},
+        {'award': {'title': {'en': 'The grant name'}, 'number': 'nonvalid1234'}, 'funder': {'name': 'The funder'}},
+        {'award': {'title': {'en': ''}, 'number': 'nonvalid5678'}, 'funder': {'name': 'https://ror.org/04t3en479'}}
+    ]
+
+
+def test_query_zenodo_api_rate_limit(mock_session):
+    responses = [(None, 429), {'id': 'gpl-3.0-only'}]
+    session = mock_session(lambda method, url, **kwargs: responses.pop(0))
+    path = '/vocabularies/licenses/gpl-3.0-only'
+
+    # the rate limited response is neither kept in the cache nor in the lookups of the object
+    assert ZenodoMetadata().query_zenodo_api(path) is None
+    metadata = ZenodoMetadata()
+    assert metadata.query_zenodo_api(path) == {'id': 'gpl-3.0-only'}
+    assert metadata.query_zenodo_api(path) == {'id': 'gpl-3.0-only'}
+    assert ZenodoMetadata().query_zenodo_api(path) == {'id': 'gpl-3.0-only'}
+    assert len(session.requests) == 2
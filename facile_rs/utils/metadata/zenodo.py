@@ -1,10 +1,26 @@
 import json
 import logging
+from urllib.parse import urlencode
 
-import requests
+from ..cache import get_cache
+from ..concurrency import map_concurrently
+from ..http import get_session
+from .zenodo_licenses import get_zenodo_licenses
 
 logger = logging.getLogger(__file__)
 
+ZENODO_API_URL = 'https://zenodo.org/api'
+LOOKUP_WORKERS = 8
+
+# only definite answers are cached, not e.g. 429 (rate limit), 401/403 or server errors
+CACHED_STATUS_CODES = [200, 404, 410]
+
+
+class PendingLookup(Exception):
+
+    """Raised by ZenodoMetadata.query_zenodo_api for queries which are not resolved yet, while get_queries
+    collects the queries needed by the converters."""
+
 
 class ZenodoMetadata:
 
@@ -73,19 +89,118 @@ class ZenodoMetadata:
         "obsoletes"
     ]
 
-    def __init__(self, data={}):
+    def __init__(self, data={}, lookup_workers=None):
         """
         Initialize the ZenodoMetadata object from CodeMeta metadata.
 
         :param data: CodeMeta metadata, typically the data attribute of a CodemetaMetadata instance.
         :type data: dict
+        :param lookup_workers: maximum number of concurrent requests to the Zenodo API (default: LOOKUP_WORKERS)
+        :type lookup_workers: int
         """
         self.data = data
+        self.lookup_workers = int(lookup_workers) if lookup_workers else LOOKUP_WORKERS
+        self.lookups = {}
+        self.pending = None
         logger.debug('data = %s', self.data)
 
+    def get_query_key(self, path, params=None):
+        return 'zenodo:' + path + ('?' + urlencode(sorted(params.items())) if params else '')
+
+    def query_zenodo_api(self, path, params=None):
+        """
+        Query the public Zenodo API. Successful responses and negative responses (404, 410) are kept in the
+        persistent cache and in self.lookups for the lifetime of this object. Other errors are not kept, so that
+        the query is sent again on the next call.
+
+        :param path: path of the API endpoint, e.g. /vocabularies/licenses/mit
+        :type path: str
+        :param params: query parameters
+        :type params: dict
+        :return: JSON response or None if the request was not successful
+        """
+        key = self.get_query_key(path, params)
+        if key in self.lookups:
+            return self.lookups[key]
+
+        # record the query, see get_queries
+        if self.pending is not None:
+            self.pending[key] = (path, params)
+            raise PendingLookup(key)
+
+        cache = get_cache()
+        found, data = cache.get(key)
+        if not found:
+            r = get_session().get(ZENODO_API_URL + path, params=params)
+            data = r.json() if r.status_code == 200 else None
+            if r.status_code not in CACHED_STATUS_CODES:
+                logger.warning('%s%s returned %s', ZENODO_API_URL, path, r.status_code)
+                return data
+
+            cache.set(key, data)
+
+        self.lookups[key] = data
+        return data
+
+    def get_queries(self):
+        """
+        Collect the queries to the Zenodo API which are needed next to convert the licenses and fundings
+        of the CodeMeta metadata. The converters are run with query_zenodo_api recording the queries
+        which are not resolved yet, instead of sending them. Each converter stops at its first unresolved
+        query, so that queries which depend on the result of another query (e.g. the funder of a funding
+        whose award could not be validated) are only collected once that query is resolved.
+
+        :return: list of unique (path, params) tuples, in the order they appear in the metadata
+        :rtype: list
+        """
+        licenses = self.data.get('license', [])
+        fundings = self.data.get('funding', [])
+
+        self.pending = {}
+        try:
+            for license in (licenses if isinstance(licenses, list) else [licenses]):
+                try:
+                    self.to_rights(license)
+                except PendingLookup:
+                    pass
+
+            for funding in (fundings if isinstance(fundings, list) else [fundings]):
+                try:
+                    self.to_funding(funding)
+                except PendingLookup:
+                    pass
+
+            return list(self.pending.values())
+        finally:
+            self.pending = None
+
+    def resolve_lookups(self):
+        """
+        Perform all queries to the Zenodo API needed by as_dict concurrently, using up to self.lookup_workers
+        threads, and store the results in self.lookups. The queries are collected with get_queries and sent
+        in rounds, until the converters need no further queries. Failed queries are logged and repeated when
+        the corresponding field is converted.
+        """
+        attempted = set()
+        while True:
+            queries = [query for query in self.get_queries() if self.get_query_key(*query) not in attempted]
+            if not queries:
+                return
+
+            logger.debug('resolve %s queries to the Zenodo API', len(queries))
+            attempted.update(self.get_query_key(*query) for query in queries)
+            try:
+                map_concurrently(lambda query: self.query_zenodo_api(*query), queries, self.lookup_workers,
+                                 'Could not query the Zenodo API for {}.',
+                                 label=lambda query: self.get_query_key(*query))
+            except RuntimeError as e:
+                logger.warning(e)
+
     def get_license_id_from_spdx(self, spdx_id):
         """
         Get Zenodo license ID from SPDX identifier. Return None if the id could not be validated.
+        The id is first looked up in the bundled index of Zenodo licenses, the Zenodo API is only
+        queried for ids which are not in the index.
 
         :param spdx_id: SPDX license identifier
         :return: Zenodo identifier for the license or None if not found
@@ -97,25 +212,25 @@ class ZenodoMetadata:
         if zenodo_id == "lgpl-3.0":
             return "lgpl-3.0-only"
 
+        if zenodo_id in get_zenodo_licenses():
+            return zenodo_id
+
         # Validate license id, use 'notspecified' if license cannot be validated
-        r = requests.get(f"https://zenodo.org/api/vocabularies/licenses/{zenodo_id}")
-        if r.status_code != 200:
+        if self.query_zenodo_api(f'/vocabularies/licenses/{zenodo_id}') is None:
             logger.info(f'Zenodo license ID {zenodo_id} could not be validated...')
             zenodo_id = None
 
         return zenodo_id
 
-    def to_rights(self, license):
+    def get_license_name(self, license):
         """
-        Convert a CodeMeta license to a Zenodo rights object.
+        Get the SPDX identifier, or the best available name, of a CodeMeta license.
 
         :param license: CodeMeta license, URL or Schema.org CreativeWork object
         :type license: str or dict
-        :return: Zenodo rights object
-        :rtype: dict
+        :return: SPDX identifier, URL or name of the license, "unknown" if none is found
+        :rtype: str
         """
-        zenodo_right = {}
-        # Attempt to find license SPDX identifier
         licenseName = "unknown"
         if isinstance(license, str):
             licenseName = license
@@ -126,7 +241,19 @@ class ZenodoMetadata:
                 licenseName = license['name']
         if licenseName.startswith("https://spdx.org/licenses/"):
             licenseName = licenseName.replace("https://spdx.org/licenses/", "")
-        zenodo_id = self.get_license_id_from_spdx(licenseName)
+        return licenseName
+
+    def to_rights(self, license):
+        """
+        Convert a CodeMeta license to a Zenodo rights object.
+
+        :param license: CodeMeta license, URL or Schema.org CreativeWork object
+        :type license: str or dict
+        :return: Zenodo rights object
+        :rtype: dict
+        """
+        zenodo_right = {}
+        zenodo_id = self.get_license_id_from_spdx(self.get_license_name(license))
 
         if zenodo_id:
             zenodo_right['id'] = zenodo_id
@@ -223,11 +350,8 @@ class ZenodoMetadata:
         :return: Zenodo funding object or empty dictionary
         :rtype: dict
         """
-        r = requests.get('https://zenodo.org/api/awards',
-            params={'q': f'number:{funding_identifier}'}
-            )
-        r_json = r.json()
-        if r.status_code == 200 and r_json['hits']['total'] == 1:
+        r_json = self.query_zenodo_api('/awards', params={'q': f'number:{funding_identifier}'})
+        if r_json is not None and r_json['hits']['total'] == 1:
             return r_json['hits']['hits'][0]
         logger.info(f'Funding identifier {funding_identifier} could not be validated...')
         return {}
@@ -287,28 +411,31 @@ class ZenodoMetadata:
         Supports plain identifier or full ROR URL.
         """
         funder_identifier = funder_identifier.replace(self.prefixes['ror'], '')
-        r = requests.get('https://zenodo.org/api/funders',
-            params={'q': f'id:{funder_identifier}'}
-            )
-        r_json = r.json()
-        if r.status_code == 200 and r_json['hits']['total'] == 1:
+        r_json = self.query_zenodo_api('/funders', params={'q': f'id:{funder_identifier}'})
+        if r_json is not None and r_json['hits']['total'] == 1:
             return r_json['hits']['hits'][0]['id']
         logger.info(f'Funder identifier {funder_identifier} could not be validated...')
         return None
 
-    def to_funder(self, funder):
+    def get_funder_identifier(self, funder):
         """
-        Convert a CodeMeta funder to a Zenodo funder object.
+        Get the identifier of a CodeMeta funder, or None if the funder has no identifier.
         """
-        zenodo_funder = {}
         if isinstance(funder, str):
-            funderid = self.validate_funder_identifier(funder)
+            return funder
         elif isinstance(funder, dict) and 'id' in funder:
-            funderid = self.validate_funder_identifier(funder['id'])
+            return funder['id']
         elif isinstance(funder, dict) and '@id' in funder:
-            funderid = self.validate_funder_identifier(funder['@id'])
-        else:
-            funderid = None
+            return funder['@id']
+        return None
+
+    def to_funder(self, funder):
+        """
+        Convert a CodeMeta funder to a Zenodo funder object.
+        """
+        zenodo_funder = {}
+        funder_identifier = self.get_funder_identifier(funder)
+        funderid = self.validate_funder_identifier(funder_identifier) if funder_identifier else None
         if funderid:
             zenodo_funder['id'] = funderid
         else:
@@ -387,6 +514,8 @@ class ZenodoMetadata:
 
         :return: Zenodo metadata dictionary
         """
+        # Query the Zenodo API for all licenses, fundings and funders at once
+        self.resolve_lookups()
 
         zenodo_dict = {
             'metadata': {
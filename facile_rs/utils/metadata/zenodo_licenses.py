@@ -0,0 +1,91 @@
+"""Bundled index of the Zenodo license vocabulary.
+
+The index is stored in zenodo_licenses.json next to this module and is used to resolve license identifiers
+without querying the Zenodo API, all other licenses are still looked up in the API. Maintainers can generate
+and refresh it from the Zenodo API with:
+
+    python -m facile_rs.utils.metadata.zenodo_licenses
+
+An index without ``source`` and ``updated`` was not generated from the API, but written by hand with a few
+identifiers which were checked against the API.
+
+"""
+
+import argparse
+import json
+import logging
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+
+from ..http import get_session
+
+logger = logging.getLogger(__file__)
+
+ZENODO_LICENSES_PATH = Path(__file__).with_name('zenodo_licenses.json')
+ZENODO_LICENSES_URL = 'https://zenodo.org/api/vocabularies/licenses'
+
+
+@lru_cache(maxsize=None)
+def get_zenodo_licenses():
+    """
+    Load the bundled index of Zenodo license identifiers. The index is only read once per process.
+
+    :return: set of Zenodo license identifiers
+    :rtype: frozenset
+    """
+    try:
+        with open(ZENODO_LICENSES_PATH) as fp:
+            return frozenset(json.load(fp)['licenses'])
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning('Could not load %s: %s', ZENODO_LICENSES_PATH, e)
+        return frozenset()
+
+
+def fetch_zenodo_licenses(url=ZENODO_LICENSES_URL, page_size=500):
+    """
+    Fetch all license identifiers of the Zenodo vocabulary, following the pagination of the API.
+
+    :param url: URL of the license vocabulary in the Zenodo API
+    :type url: str
+    :param page_size: number of licenses per request
+    :type page_size: int
+    :return: sorted list of Zenodo license identifiers
+    :rtype: list
+    """
+    licenses = set()
+    params = {'size': page_size, 'page': 1}
+    while url:
+        response = get_session().get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        licenses.update(hit['id'] for hit in data['hits']['hits'])
+
+        # the next link already contains the query parameters
+        url, params = data.get('links', {}).get('next'), None
+
+    return sorted(licenses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the bundled index of Zenodo licenses.')
+    parser.add_argument('--zenodo-licenses-url', dest='zenodo_licenses_url', default=ZENODO_LICENSES_URL,
+                        help=f'URL of the license vocabulary in the Zenodo API (default: {ZENODO_LICENSES_URL})')
+    parser.add_argument('--output', dest='output', default=ZENODO_LICENSES_PATH,
+                        help='Path to the index file (default: the index bundled with FACILE-RS)')
+    args = parser.parse_args()
+
+    licenses = fetch_zenodo_licenses(args.zenodo_licenses_url)
+    with open(args.output, 'w') as fp:
+        json.dump({
+            'source': args.zenodo_licenses_url,
+            'updated': date.today().isoformat(),
+            'licenses': licenses
+        }, fp, indent=2)
+        fp.write('\n')
+
+    print(f'Stored {len(licenses)} licenses in {args.output}.')
+
+
+if __name__ == '__main__':
+    main()
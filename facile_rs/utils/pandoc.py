@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pypandoc
+
+from .cache import get_pandoc_cache
+from .checksum import get_checksums
+from .concurrency import get_default_processes, map_concurrently
+
+logger = logging.getLogger(__file__)
+
+# pandoc lua and the pandoc.json module are available since pandoc 3.1.1
+BATCH_PANDOC_VERSION = (3, 1, 1)
+
+# converts a list of texts independently of each other in one pandoc process
+BATCH_SCRIPT = '''
+local input = pandoc.json.decode(io.read('a'), false)
+local outputs = {}
+for i, text in ipairs(input.texts) do
+  outputs[i] = pandoc.write(pandoc.read(text, input.from), input.to, input.options)
+end
+io.write(pandoc.json.encode(outputs))
+'''
+
+
+def get_pandoc_version():
+    """
+    Get the version of the pandoc executable used by pypandoc.
+
+    :return: version as a tuple of integers
+    :rtype: tuple
+    """
+    return tuple(int(part) for part in pypandoc.get_pandoc_version().split('.') if part.isdigit())
+
+
+def convert_batch(texts, to, format, options=None):
+    """
+    Convert several texts with one pandoc process. Each text is converted on its own, as if
+    pypandoc.convert_text was called for it.
+
+    :param texts: texts to convert
+    :type texts: list
+    :param to: output format
+    :type to: str
+    :param format: input format
+    :type format: str
+    :param options: pandoc writer options, e.g. {'html_math_method': 'mathjax', 'wrap_text': 'preserve'}
+    :type options: dict
+    :return: converted texts, in the order of the texts
+    :rtype: list
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.lua') as script:
+        script.write(BATCH_SCRIPT)
+        script.flush()
+
+        process = subprocess.run([pypandoc.get_pandoc_path(), 'lua', script.name],
+                                 input=json.dumps({'texts': texts, 'from': format, 'to': to, 'options': options or {}}),
+                                 capture_output=True, text=True, encoding='utf-8')
+
+    if process.returncode != 0:
+        raise RuntimeError(f'pandoc failed: {process.stderr.strip()}')
+
+    # pandoc adds a final newline when writing to stdout
+    return [output + '\n' for output in json.loads(process.stdout)]
+
+
+def get_conversion_key(text, to, format, extra_args=(), files=()):
+    """
+    Get the key of a conversion in the pandoc cache: a hash of the text, the pandoc version, the formats,
+    the extra arguments and the content of the files used by the conversion.
+
+    :param files: paths to the files used by the conversion, e.g. a bibliography or a CSL file
+    :type files: list
+    :return: hex digest
+    :rtype: str
+    """
+    m = hashlib.sha256()
+    for part in [pypandoc.get_pandoc_version(), to, format, *extra_args]:
+        m.update(str(part).encode() + b'\0')
+    for file_path in files:
+        # files which are not local, e.g. CSL styles given by name or URL, are hashed by their location
+        if Path(file_path).expanduser().is_file():
+            m.update(get_checksums(Path(file_path).expanduser(), ['sha256'])['sha256'].encode() + b'\0')
+        else:
+            m.update(str(file_path).encode() + b'\0')
+    m.update(text.encode())
+    return m.hexdigest()
+
+
+def convert_text(text, to, format, extra_args=(), files=()):
+    """
+    Convert a text with pandoc, using the pandoc cache, see convert_texts.
+
+    :return: converted text
+    :rtype: str
+    """
+    return convert_texts([text], to, format, extra_args=extra_args, workers=1, files=files)[0]
+
+
+def convert_texts(texts, to, format, extra_args=(), options=None, workers=None, batch_size=None, files=()):
+    """
+    Convert several texts with pandoc using a pool of worker threads.
+
+    The outputs are stored in the pandoc cache, and only the texts which are not in the cache yet
+    are converted. By default, one pandoc process is started for each text, using extra_args. If batch_size
+    is given and pandoc supports it, the texts are converted in batches of batch_size texts per pandoc process,
+    using options. Both have to describe the same conversion.
+
+    :param texts: texts to convert
+    :type texts: list
+    :param to: output format
+    :type to: str
+    :param format: input format
+    :type format: str
+    :param extra_args: command line arguments for pandoc, e.g. ['--mathjax', '--wrap=preserve']
+    :type extra_args: list
+    :param options: pandoc writer options for the batch mode, e.g. {'html_math_method': 'mathjax'}
+    :type options: dict
+    :param workers: maximum number of pandoc processes at the same time (default: number of CPUs)
+    :type workers: int
+    :param batch_size: number of texts converted by one pandoc process (default: one process per text)
+    :type batch_size: int
+    :param files: paths to the files used by the conversion, their content is part of the cache key
+    :type files: list
+    :return: converted texts, in the order of the texts
+    :rtype: list
+    """
+    pandoc_cache = get_pandoc_cache()
+
+    keys = [get_conversion_key(text, to, format, extra_args, files) for text in texts]
+    outputs = pandoc_cache.get_many(keys)
+
+    # convert each missing text only once
+    missing = {key: text for key, text in zip(keys, texts) if key not in outputs}
+    logger.info('converting %s of %s texts with pandoc', len(missing), len(texts))
+
+    if missing:
+        converted = dict(zip(missing, run_pandoc(list(missing.values()), to, format, extra_args, options,
+                                                 workers, batch_size)))
+        pandoc_cache.set_many(converted)
+        outputs.update(converted)
+
+    return [outputs[key] for key in keys]
+
+
+def run_pandoc(texts, to, format, extra_args=(), options=None, workers=None, batch_size=None):
+    """
+    Convert several texts with pandoc without the cache, see convert_texts.
+
+    :return: converted texts, in the order of the texts
+    :rtype: list
+    """
+    workers = int(workers) if workers else get_default_processes()
+    batch_size = int(batch_size) if batch_size else 0
+
+    if batch_size > 0 and get_pandoc_version() < BATCH_PANDOC_VERSION:
+        logger.warning('pandoc %s does not support batches, converting one text per process',
+                       pypandoc.get_pandoc_version())
+        batch_size = 0
+
+    if batch_size > 0:
+        batches = [(i, texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        results = map_concurrently(lambda item: convert_batch(item[1], to, format, options), batches, workers,
+                                   'Could not convert the batches starting at {} with pandoc.',
+                                   label=lambda item: f'text {item[0]}')
+        return [output for batch_outputs in results for output in batch_outputs]
+    else:
+        return map_concurrently(lambda text: pypandoc.convert_text(text, to=to, format=format, extra_args=extra_args),
+                                texts, workers, 'Could not convert {} with pandoc.', label=lambda text: repr(text[:40]))
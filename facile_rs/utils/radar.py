@@ -1,25 +1,140 @@
+import hashlib
+import json
 import logging
+import os
+import time
+from pathlib import Path
 
 import requests
 
+from .concurrency import map_concurrently
+from .http import MultipartFile, get_session, get_upload_timeout
+
 logger = logging.getLogger(__file__)
 
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3
+
+# tokens are renewed this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 60
+
+_tokens = {}
+
+
+def read_radar_tokens(cache_path):
+    try:
+        return json.loads(Path(cache_path).expanduser().read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_radar_tokens(cache_path, tokens):
+    # the file contains bearer tokens, so it is only readable by the current user, the mode given to open
+    # only applies to new files, so it is also set for existing files (os.fchmod is not available on Windows)
+    path = Path(cache_path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, 'fchmod'):
+        os.fchmod(fd, 0o600)
+    with open(fd, 'w') as f:
+        json.dump(tokens, f)
+
+
+def get_radar_token_key(radar_url, client_id, username):
+    return hashlib.sha256(f'{radar_url} {client_id} {username}'.encode()).hexdigest()
+
+
+def load_radar_token(key, cache_path=None):
+    """
+    Load a RADAR token from the in-process cache or from the cache file, if it has not expired yet.
+
+    :param key: cache key of the token
+    :param cache_path: path to the JSON file used to cache tokens between processes
+    :return: RADAR access token or None
+    """
+    token = _tokens.get(key)
+
+    if token is None and cache_path:
+        token = read_radar_tokens(cache_path).get(key)
+
+    if token is not None:
+        if token['expires_at'] is None or token['expires_at'] > time.time() + TOKEN_EXPIRY_MARGIN:
+            _tokens[key] = token
+            return token['access_token']
+        logger.debug('token for %s has expired', key)
+        _tokens.pop(key, None)
+
+    return None
+
+
+def store_radar_token(key, access_token, expires_in=None, cache_path=None):
+    """
+    Store a RADAR token in the in-process cache and, if its lifetime is known, in the cache file.
+
+    :param key: cache key of the token
+    :param access_token: RADAR access token
+    :param expires_in: lifetime of the token in seconds
+    :param cache_path: path to the JSON file used to cache tokens between processes
+    """
+    token = {
+        'access_token': access_token,
+        'expires_at': time.time() + float(expires_in) if expires_in else None
+    }
+    _tokens[key] = token
+
+    if cache_path and token['expires_at'] is not None:
+        tokens = read_radar_tokens(cache_path)
+        tokens[key] = token
+        write_radar_tokens(cache_path, tokens)
+
+
+def evict_radar_token(key, cache_path=None):
+    """
+    Remove a RADAR token from the in-process cache and from the cache file, e.g. after RADAR rejected it.
+
+    :param key: cache key of the token
+    :param cache_path: path to the JSON file used to cache tokens between processes
+    """
+    _tokens.pop(key, None)
+
+    if cache_path:
+        tokens = read_radar_tokens(cache_path)
+        if tokens.pop(key, None) is not None:
+            write_radar_tokens(cache_path, tokens)
+
 
-def fetch_radar_token(radar_url, client_id, client_secret, redirect_url, username, password):
+def fetch_radar_token(radar_url, client_id, client_secret, redirect_url, username, password, cache_path=None,
+                      refresh=False):
     """
     Fetch RADAR token using the RADAR API.
 
+    Tokens are cached for the lifetime of the process and, if cache_path is given, in a file, so that
+    consecutive calls do not authenticate again until the token expires.
+
     :param radar_url: URL to the RADAR repository
     :param client_id: RADAR client ID
     :param client_secret: RADAR client secret
     :param redirect_url: RADAR redirect URL
     :param username: RADAR username
     :param password: RADAR password
+    :param cache_path: path to the JSON file used to cache tokens between processes
+    :param refresh: remove the cached token and fetch a new one
     :return: RADAR token for the given user
     """
+    key = get_radar_token_key(radar_url, client_id, username)
+    if refresh:
+        evict_radar_token(key, cache_path)
+
+    access_token = load_radar_token(key, cache_path)
+    if access_token is not None:
+        logger.debug('using cached token')
+        return {
+            'Authorization': f'Bearer {access_token}'
+        }
+
     url = radar_url + '/radar/api/tokens'
     try:
-        response = requests.post(url, json={
+        response = get_session().post(url, json={
             'clientId': client_id,
             'clientSecret': client_secret,
             'redirectUrl': redirect_url,
@@ -33,11 +148,41 @@ def fetch_radar_token(radar_url, client_id, client_secret, redirect_url, usernam
         raise e
 
     tokens = response.json()
+    store_radar_token(key, tokens['access_token'], tokens.get('expires_in'), cache_path)
     return {
         'Authorization': 'Bearer {}'.format(tokens['access_token'])
     }
 
 
+def with_radar_token(func, radar_url, client_id, client_secret, redirect_url, username, password, cache_path=None):
+    """
+    Call a function with the headers of a RADAR token, as returned by fetch_radar_token. If RADAR rejects
+    the token with 401, e.g. because a cached token was revoked or expired early, a new token is fetched
+    once and the function is called again.
+
+    :param func: function called with the headers as single argument, e.g. to create a dataset
+    :param radar_url: URL to the RADAR repository
+    :param client_id: RADAR client ID
+    :param client_secret: RADAR client secret
+    :param redirect_url: RADAR redirect URL
+    :param username: RADAR username
+    :param password: RADAR password
+    :param cache_path: path to the JSON file used to cache tokens between processes
+    :return: tuple of the result of the function and the headers which were accepted by RADAR
+    """
+    token_args = (radar_url, client_id, client_secret, redirect_url, username, password)
+    headers = fetch_radar_token(*token_args, cache_path=cache_path)
+    try:
+        return func(headers), headers
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code != 401:
+            raise e
+
+    logger.warning('RADAR rejected the token, fetching a new one')
+    headers = fetch_radar_token(*token_args, cache_path=cache_path, refresh=True)
+    return func(headers), headers
+
+
 def create_radar_dataset(radar_url, workspace_id, headers, radar_dict):
     """
     Create a dataset in the given RADAR workspace, using the token provided in headers.
@@ -50,7 +195,7 @@ def create_radar_dataset(radar_url, workspace_id, headers, radar_dict):
     """
     url = radar_url + f'/radar/api/workspaces/{workspace_id}/datasets'
     try:
-        response = requests.post(url, headers=headers, json=radar_dict)
+        response = get_session().post(url, headers=headers, json=radar_dict)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         return response.json()['id']
@@ -71,10 +216,10 @@ def prepare_radar_dataset(radar_url, dataset_id, headers):
 
     review_url = radar_url + f'/radar/api/datasets/{dataset_id}/startreview'
     try:
-        response = requests.post(review_url, headers=headers)
+        response = get_session().post(review_url, headers=headers)
         if response.status_code == 422:
             dataset_url = radar_url + f'/radar/api/datasets/{dataset_id}/'
-            response = requests.get(dataset_url, headers=headers)
+            response = get_session().get(dataset_url, headers=headers)
             response.raise_for_status()
             logger.debug('response = %s', response.json())
             return response.json()
@@ -98,7 +243,7 @@ def update_radar_dataset(radar_url, dataset_id, headers, radar_dict):
     """
     url = radar_url + f'/radar/api/datasets/{dataset_id}'
     try:
-        response = requests.put(url, headers=headers, json=radar_dict)
+        response = get_session().put(url, headers=headers, json=radar_dict)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         return response.json()['id']
@@ -107,9 +252,52 @@ def update_radar_dataset(radar_url, dataset_id, headers, radar_dict):
         raise e
 
 
-def upload_radar_assets(radar_url, dataset_id, headers, assets, path):
+def upload_radar_file(radar_url, dataset_id, headers, target, retries=UPLOAD_RETRIES):
+    """
+    Upload a file to a RADAR dataset, retrying on connection errors and server errors.
+
+    :param radar_url: URL to the RADAR repository
+    :param dataset_id: RADAR dataset ID
+    :param headers: request headers. Typically the RADAR token, as returned by fetch_radar_token
+    :param target: path to the file to upload
+    :param retries: number of retries
+    :type retries: int
+    """
+    url = radar_url + f'/radar-ingest/upload/{dataset_id}/file'
+
+    for attempt in range(retries + 1):
+        # stream the multipart body from disk, so that the file is never held in memory
+        with MultipartFile('upload_file', target) as body:
+            start = time.perf_counter()
+            try:
+                response = get_session().post(url, data=body,
+                                              headers={**headers, 'Content-Type': body.content_type},
+                                              timeout=get_upload_timeout())
+                response.raise_for_status()
+                logger.debug('response = %s', response.text)
+            except requests.exceptions.HTTPError as e:
+                if response.status_code < 500 or attempt == retries:
+                    print(response.text)
+                    raise e
+                logger.warning('upload of %s failed (%s: %s), retrying', target.name, e, response.text)
+                time.sleep(2 ** attempt)
+                continue
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == retries:
+                    raise e
+                logger.warning('upload of %s failed (%s), retrying', target.name, e)
+                time.sleep(2 ** attempt)
+                continue
+            seconds = time.perf_counter() - start
+
+        logger.info('uploaded %s (%d bytes) in %.2f s (%.1f MB/s)',
+                    target.name, body.bytes_read, seconds, body.bytes_read / seconds / 1e6 if seconds else 0)
+        return
+
+
+def upload_radar_assets(radar_url, dataset_id, headers, assets, path, workers=None, retries=None):
     """
-    Upload assets to a RADAR dataset.
+    Upload assets to a RADAR dataset. The assets are uploaded concurrently.
 
     :param radar_url: URL to the RADAR repository
     :param dataset_id: RADAR dataset ID
@@ -117,16 +305,14 @@ def upload_radar_assets(radar_url, dataset_id, headers, assets, path):
     :param assets: locations of assets to upload
     :type assets: list
     :param path: location where the assets are collected before upload
+    :param workers: maximum number of files uploaded at the same time (default: UPLOAD_WORKERS)
+    :type workers: int
+    :param retries: number of retries for each file (default: UPLOAD_RETRIES)
+    :type retries: int
     """
-    url = radar_url + f'/radar-ingest/upload/{dataset_id}/file'
-    for location in assets:
-        target = path / location.split('/')[-1]
-        files = {'upload_file': open(target, 'rb')}
+    workers = int(workers) if workers else UPLOAD_WORKERS
+    retries = int(retries) if retries is not None else UPLOAD_RETRIES
 
-        try:
-            response = requests.post(url, files=files, headers=headers)
-            response.raise_for_status()
-            logger.debug('response = %s', response.text)
-        except requests.exceptions.HTTPError as e:
-            print(response.text)
-            raise e
+    filenames = list(dict.fromkeys(location.split('/')[-1] for location in assets))
+    map_concurrently(lambda filename: upload_radar_file(radar_url, dataset_id, headers, path / filename, retries),
+                     filenames, workers, 'Could not upload {} to RADAR.')
@@ -0,0 +1,64 @@
+import time
+
+from facile_rs.utils import settings
+from facile_rs.utils.cache import Cache, get_cache, set_cache
+
+
+def test_get_set(tmp_path):
+    cache = Cache(tmp_path / 'cache.sqlite3')
+    assert cache.get('zenodo:licenses') == (False, None)
+
+    cache.set('zenodo:licenses', {'id': 'mit'})
+    assert cache.get('zenodo:licenses') == (True, {'id': 'mit'})
+
+    # the cache persists across instances
+    assert Cache(tmp_path / 'cache.sqlite3').get('zenodo:licenses') == (True, {'id': 'mit'})
+
+
+def test_expiry(tmp_path, monkeypatch):
+    cache = Cache(tmp_path / 'cache.sqlite3', ttl=100, negative_ttl=10)
+    cache.set('zenodo:found', {'id': 'mit'})
+    cache.set('zenodo:missing', None)
+    assert cache.get('zenodo:missing') == (True, None)
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 50)
+    assert cache.get('zenodo:found') == (True, {'id': 'mit'})
+    assert cache.get('zenodo:missing') == (False, None)
+
+    monkeypatch.setattr(time, 'time', lambda: now + 150)
+    assert cache.get('zenodo:found') == (False, None)
+
+
+def test_clear(tmp_path):
+    cache = Cache(tmp_path / 'cache.sqlite3')
+    cache.set('zenodo:a', 1)
+    cache.set('zenodo:b', 2)
+    cache.set('zenodo_other', 3)
+    cache.set('radar:a', 4)
+
+    assert cache.clear('zenodo:') == 2
+    assert cache.get('zenodo_other') == (True, 3)
+    assert cache.clear() == 2
+    assert cache.get('radar:a') == (False, None)
+
+
+def test_disabled(tmp_path):
+    cache = Cache(tmp_path / 'cache.sqlite3', ttl=0)
+    cache.set('zenodo:a', 1)
+    assert cache.get('zenodo:a') == (False, None)
+    assert not cache.path.exists()
+
+
+def test_get_cache_settings(monkeypatch, tmp_path):
+    set_cache(None)
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(tmp_path), raising=False)
+    monkeypatch.setattr(settings, 'CACHE_TTL', '60', raising=False)
+    cache = get_cache()
+    assert cache.ttl == 60
+    assert get_cache() is cache
+
+    # a later step of facile-rs run might use other settings
+    monkeypatch.setattr(settings, 'CACHE_TTL', '120')
+    assert get_cache() is not cache
+    assert get_cache().ttl == 120
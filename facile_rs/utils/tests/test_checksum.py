@@ -0,0 +1,18 @@
+import hashlib
+
+from facile_rs.utils.checksum import get_checksums, get_sha256, get_sha512
+
+
+def test_get_checksums(tmp_path):
+    content = bytes(range(256)) * 1000 + b'\r\n'
+    file_path = tmp_path / 'asset.bin'
+    file_path.write_bytes(content)
+
+    checksums = get_checksums(file_path, ['md5', 'sha256', 'sha512'], chunk_size=1000)
+    assert checksums == {
+        'md5': hashlib.md5(content).hexdigest(),
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'sha512': hashlib.sha512(content).hexdigest()
+    }
+    assert get_sha256(file_path) == checksums['sha256']
+    assert get_sha512(file_path) == checksums['sha512']
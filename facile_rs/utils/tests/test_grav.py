@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from facile_rs.utils.grav import collect_pages, read_header, write_page
+
+
+def test_write_page(tmpdir):
+    page_path = Path(tmpdir.join('default.md'))
+
+    assert write_page(page_path, '---\ntitle: Test\n---\n') is True
+    mtime_ns = page_path.stat().st_mtime_ns
+
+    # the same content is not written again
+    assert write_page(page_path, '---\ntitle: Test\n---\n') is False
+    assert page_path.stat().st_mtime_ns == mtime_ns
+
+    assert write_page(page_path, '---\ntitle: Changed\n---\n') is True
+    assert page_path.read_text() == '---\ntitle: Changed\n---\n'
+
+
+def test_read_header(tmpdir):
+    page_path = tmpdir.join('default.md')
+
+    page_path.write('\n---\ntitle: Test\npipeline: test\n---\n---\nnot: front matter\n')
+    assert read_header(page_path) == {'title': 'Test', 'pipeline': 'test'}
+
+    page_path.write('no front matter\n---\n')
+    assert read_header(page_path) == {}
+
+    page_path.write('---\n- not a mapping\n---\n')
+    assert read_header(page_path) == {}
+
+
+def test_collect_pages(monkeypatch, tmpdir):
+    grav_path = tmpdir.mkdir('grav')
+    pages_path = grav_path.mkdir('pages')
+    pages_path.mkdir('01.home').join('default.md').write('---\ntitle: Home\n---\nHome\n')
+    pages_path.mkdir('02.test').join('default.md').write('---\ntitle: Test\npipeline: test\nsource: test.md\n---\n')
+    pages_path.join('02.test').mkdir('modular').join('modular.md').write('---\npipeline: test\n---\n')
+
+    headers = []
+    monkeypatch.setattr('facile_rs.utils.grav.read_header',
+                        lambda file_path: headers.append(file_path) or read_header(file_path))
+
+    pages = collect_pages(grav_path, 'test')
+    assert [(file_path.parent.name, page['title'], source) for file_path, page, source in pages] == [
+        ('02.test', 'Test', 'test.md')
+    ]
+    assert len(headers) == 2
+
+    # unchanged pages are taken from the index
+    assert [file_path for file_path, page, source in collect_pages(grav_path, 'test')] == [pages[0][0]]
+    assert len(headers) == 2
+
+    # modified pages are read again
+    pages_path.join('01.home', 'default.md').write('---\ntitle: Home\npipeline: test\n---\n')
+    pages = collect_pages(grav_path, 'test')
+    assert [file_path.parent.name for file_path, page, source in pages] == ['01.home', '02.test']
+    assert len(headers) == 3
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from urllib3 import encode_multipart_formdata
+from urllib3.fields import RequestField
+
+from facile_rs.utils import http
+from facile_rs.utils.cache import HttpCache
+from facile_rs.utils.http import (
+    STAGING_STRATEGIES,
+    MultipartFile,
+    clear_documents,
+    create_session,
+    fetch_dict,
+    fetch_files,
+    fetch_json,
+    get_session,
+    get_upload_timeout,
+    set_session,
+    stage_file,
+)
+
+
+def test_create_session():
+    session = create_session(timeout=5, pool_size=4, retries=2)
+    adapter = session.get_adapter('https://zenodo.org')
+    assert session.timeout == 5
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert session.get_adapter('http://zenodo.org') is adapter
+
+
+def test_get_session():
+    set_session(None)
+    session = get_session()
+    assert get_session() is session
+    http.close_session()
+    assert get_session() is not session
+    http.close_session()
+
+
+def test_get_session_settings(monkeypatch):
+    set_session(None)
+    try:
+        monkeypatch.setattr(http.settings, 'HTTP_TIMEOUT', '5', raising=False)
+        session = get_session()
+        assert session.timeout == 5
+        assert get_session() is session
+
+        # a later step of facile-rs run might use other settings
+        monkeypatch.setattr(http.settings, 'HTTP_TIMEOUT', '10')
+        assert get_session() is not session
+        assert get_session().timeout == 10
+
+        # an injected session is kept
+        session = create_session(timeout=1)
+        set_session(session)
+        assert get_session() is session
+    finally:
+        http.close_session()
+
+
+def test_get_session_threads():
+    set_session(None)
+    try:
+        # the workers which request the session first all get the same one
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = list(executor.map(lambda i: get_session(), range(32)))
+        assert all(session is sessions[0] for session in sessions)
+    finally:
+        http.close_session()
+
+
+def test_get_upload_timeout():
+    set_session(create_session(timeout=5))
+    try:
+        assert get_upload_timeout() == (5, None)
+    finally:
+        http.close_session()
+
+
+def test_set_session(mock_session):
+    session = mock_session(lambda method, url, **kwargs: {'url': url})
+    assert fetch_json('https://example.org/data.json') == {'url': 'https://example.org/data.json'}
+    assert [url for method, url, kwargs in session.requests] == ['https://example.org/data.json']
+
+
+def test_http_cache(mock_session):
+    def handler(method, url, headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return ('', 304)
+        return ('{"name": "FACILE-RS"}', 200, {'ETag': '"v1"'})
+
+    session = mock_session(handler)
+    assert fetch_dict('https://example.org/codemeta.json') == {'name': 'FACILE-RS'}
+    clear_documents()
+    assert fetch_dict('https://example.org/codemeta.json') == {'name': 'FACILE-RS'}
+    assert [kwargs['headers'] for method, url, kwargs in session.requests] == [{}, {'If-None-Match': '"v1"'}]
+
+
+def test_fetch_dict_memo(monkeypatch, tmp_path):
+    parsed = []
+    parse_dict = http.parse_dict
+    monkeypatch.setattr(http, 'parse_dict', lambda location: parsed.append(location) or parse_dict(location))
+
+    codemeta_path = tmp_path / 'codemeta.json'
+    codemeta_path.write_text('{"name": "FACILE-RS", "author": []}')
+
+    data = fetch_dict(str(codemeta_path))
+    data['author'].append({'name': 'Someone'})
+
+    # the same file is only parsed once and each call gets its own copy
+    monkeypatch.chdir(tmp_path)
+    assert fetch_dict('./codemeta.json') == {'name': 'FACILE-RS', 'author': []}
+    assert len(parsed) == 1
+
+    # the file is parsed again after it was modified
+    codemeta_path.write_text('{"name": "FACILE-RS 2", "author": []}')
+    assert fetch_dict(str(codemeta_path))['name'] == 'FACILE-RS 2'
+    assert len(parsed) == 2
+
+    assert http.get_document_key('HTTPS://Example.org/codemeta.json#x') == 'https://example.org/codemeta.json'
+
+
+def test_http_cache_eviction(tmp_path):
+    http_cache = HttpCache(tmp_path / 'http.sqlite3', max_size=10)
+    http_cache.set('a', '"a"', None, 'aaaa')
+    http_cache.set('b', '"b"', None, 'bbbb')
+    assert http_cache.get('a') == ('"a"', None, 'aaaa')
+
+    # b is the least recently used response
+    http_cache.set('c', '"c"', None, 'cccc')
+    assert http_cache.get('b') is None
+    assert http_cache.get('a') is not None
+    assert http_cache.get('c') is not None
+
+    # responses larger than the cache are not stored
+    http_cache.set('d', '"d"', None, 'd' * 11)
+    assert http_cache.get('d') is None
+    assert http_cache.clear() == 2
+
+
+def test_fetch_files(tmp_path):
+    source_path = tmp_path / 'source'
+    source_path.mkdir()
+    locations = []
+    for i in range(8):
+        location = source_path / f'asset-{i}.txt'
+        location.write_text(f'asset {i}')
+        locations.append(str(location))
+
+    target_path = tmp_path / 'target'
+    target_path.mkdir()
+    fetch_files(locations, target_path, workers=3)
+    for location in locations:
+        assert (target_path / Path(location).name).read_text() == Path(location).read_text()
+
+
+def test_fetch_files_errors(tmp_path):
+    source_path = tmp_path / 'source'
+    source_path.mkdir()
+    (source_path / 'asset.txt').write_text('asset')
+    locations = [
+        str(source_path / 'missing-1.txt'),
+        str(source_path / 'asset.txt'),
+        str(source_path / 'missing-2.txt')
+    ]
+
+    target_path = tmp_path / 'target'
+    target_path.mkdir()
+    with pytest.raises(RuntimeError) as excinfo:
+        fetch_files(locations, target_path, workers=3)
+    assert str(excinfo.value) == f'Could not fetch {locations[0]}, {locations[2]}.'
+    assert isinstance(excinfo.value.__cause__, FileNotFoundError)
+    assert (target_path / 'asset.txt').read_text() == 'asset'
+
+
+def test_fetch_files_download(mock_session, tmp_path):
+    mock_session(lambda method, url, **kwargs: url)
+    fetch_files(['https://example.org/assets/asset.tar.gz'], tmp_path, chunk_size=4)
+    assert (tmp_path / 'asset.tar.gz').read_text() == 'https://example.org/assets/asset.tar.gz'
+    assert [path.name for path in tmp_path.iterdir()] == ['asset.tar.gz']
+
+    # downloaded files get the same permissions as files created with open
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE((tmp_path / 'asset.tar.gz').stat().st_mode) == 0o666 & ~umask
+
+
+@pytest.mark.parametrize('strategy', STAGING_STRATEGIES)
+def test_stage_file(tmp_path, strategy):
+    source = tmp_path / 'asset.txt'
+    source.write_text('asset')
+    target = tmp_path / 'target.txt'
+
+    stage_file(str(source), target, strategy)
+    assert target.read_text() == 'asset'
+    assert target.is_symlink() == (strategy == 'symlink')
+    assert source.exists() == (strategy != 'move')
+    if strategy == 'hardlink':
+        assert target.stat().st_ino == source.stat().st_ino
+
+
+def test_fetch_files_checksums(tmp_path):
+    source = tmp_path / 'asset.txt'
+    source.write_text('asset')
+    for strategy in ['copy', 'hardlink']:
+        target_path = tmp_path / strategy
+        target_path.mkdir()
+        checksums = fetch_files([str(source)], target_path, algorithms=['md5'], strategy=strategy)
+        assert checksums == {target_path / 'asset.txt': {'md5': hashlib.md5(b'asset').hexdigest()}}
+
+
+def test_multipart_file(tmp_path):
+    file_path = tmp_path / 'asset.bin'
+    file_path.write_bytes(bytes(range(256)) * 100)
+
+    with MultipartFile('upload_file', file_path) as body:
+        field = RequestField(name='upload_file', data=file_path.read_bytes(), filename='asset.bin')
+        field.make_multipart()
+        expected, content_type = encode_multipart_formdata([field], boundary=body.boundary)
+
+        data = b''.join(iter(lambda: body.read(1000), b''))
+        assert data == expected
+        assert len(body) == len(expected) == body.bytes_read
+        assert body.content_type == content_type
+    assert body.file.closed
@@ -0,0 +1,64 @@
+import pypandoc
+import pytest
+
+from facile_rs.utils.cache import PandocCache, set_pandoc_cache
+from facile_rs.utils.pandoc import BATCH_PANDOC_VERSION, convert_texts, get_conversion_key, get_pandoc_version
+
+TEXTS = [
+    'Title\n=====\n\nSome *text* with :math:`x^2`.\n\nSection\n-------\n\nMore text.',
+    'Other title\n-----------\n\nA `link <https://example.org>`_.\n\n.. math::\n\n   a = b',
+    'Title\n=====\n\nThe same title again.'
+]
+
+EXTRA_ARGS = ['--mathjax', '--wrap=preserve']
+OPTIONS = {'html_math_method': 'mathjax', 'wrap_text': 'preserve'}
+
+
+@pytest.fixture(autouse=True)
+def pandoc_cache(tmp_path):
+    # disable the cache, unless a test enables it
+    pandoc_cache = PandocCache(tmp_path / 'pandoc.sqlite3', max_size=0)
+    set_pandoc_cache(pandoc_cache)
+    yield pandoc_cache
+    set_pandoc_cache(None)
+
+
+def test_convert_texts():
+    outputs = convert_texts(TEXTS, to='html', format='rst', extra_args=EXTRA_ARGS, workers=2)
+    assert outputs == [pypandoc.convert_text(text, to='html', format='rst', extra_args=EXTRA_ARGS) for text in TEXTS]
+
+
+@pytest.mark.skipif(get_pandoc_version() < BATCH_PANDOC_VERSION, reason='pandoc does not support batches')
+@pytest.mark.parametrize('batch_size', [1, 2, 10])
+def test_convert_texts_batch(batch_size):
+    outputs = convert_texts(TEXTS, to='html', format='rst', extra_args=EXTRA_ARGS, options=OPTIONS,
+                            workers=2, batch_size=batch_size)
+    assert outputs == convert_texts(TEXTS, to='html', format='rst', extra_args=EXTRA_ARGS)
+
+
+def test_pandoc_cache(monkeypatch, pandoc_cache):
+    pandoc_cache.max_size = 1024 * 1024
+    outputs = convert_texts(TEXTS, to='html', format='rst', extra_args=EXTRA_ARGS)
+
+    conversions = []
+    convert_text = pypandoc.convert_text
+    monkeypatch.setattr(pypandoc, 'convert_text',
+                        lambda *args, **kwargs: conversions.append(args[0]) or convert_text(*args, **kwargs))
+
+    # only the new text is converted
+    assert convert_texts([*TEXTS, 'New *text*'], to='html', format='rst', extra_args=EXTRA_ARGS) == \
+        [*outputs, '<p>New <em>text</em></p>\n']
+    assert conversions == ['New *text*']
+
+
+def test_get_conversion_key(tmp_path):
+    bib_path = tmp_path / 'refs.bib'
+    bib_path.write_text('@article{a, title={A}}')
+    key = get_conversion_key('text', 'html', 'md', ['--citeproc'], [bib_path])
+
+    assert get_conversion_key('text', 'html', 'md', ['--citeproc'], [bib_path]) == key
+    assert get_conversion_key('text', 'html', 'md', [], [bib_path]) != key
+    assert get_conversion_key('text', 'html', 'rst', ['--citeproc'], [bib_path]) != key
+
+    bib_path.write_text('@article{a, title={B}}')
+    assert get_conversion_key('text', 'html', 'md', ['--citeproc'], [bib_path]) != key
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+import requests
+
+from facile_rs.utils import radar
+from facile_rs.utils.radar import create_radar_dataset, fetch_radar_token, upload_radar_assets, with_radar_token
+
+RADAR_URL = 'https://radar.example.org'
+
+
+class MockRadar:
+
+    """Handler for MockSession, which issues tokens, creates datasets and keeps the uploaded files of a RADAR dataset"""
+
+    def __init__(self, expires_in=3600, failures=None, revoked=None):
+        self.tokens = 0
+        self.expires_in = expires_in
+        self.revoked = revoked or set()
+        self.failures = failures or {}
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, **kwargs):
+        if url.endswith('/radar/api/tokens'):
+            self.tokens += 1
+            return {'access_token': f'token-{self.tokens}', 'expires_in': self.expires_in}
+
+        if url.endswith('/datasets'):
+            if kwargs['headers']['Authorization'].split()[1] in self.revoked:
+                return ({'message': 'invalid token'}, 401)
+            return {'id': 'dataset'}
+
+        body = kwargs['data'].read()
+        filename = body.split(b'filename="')[1].split(b'"')[0].decode()
+        with self.lock:
+            if self.failures.get(filename):
+                self.failures[filename] -= 1
+                return ({'message': 'error'}, 503)
+            self.files[filename] = body
+        return {}
+
+
+@pytest.fixture
+def mock_radar(mock_session, monkeypatch):
+    monkeypatch.setattr(radar, '_tokens', {})
+    monkeypatch.setattr(radar.time, 'sleep', lambda seconds: None)
+
+    def mock_radar(**kwargs):
+        handler = MockRadar(**kwargs)
+        mock_session(handler)
+        return handler
+
+    return mock_radar
+
+
+def test_fetch_radar_token(mock_radar, tmp_path, monkeypatch):
+    session = mock_radar()
+    cache_path = tmp_path / 'cache' / 'tokens.json'
+    args = (RADAR_URL, 'client', 'secret', 'https://example.org', 'user', 'password')
+
+    assert fetch_radar_token(*args, cache_path=cache_path) == {'Authorization': 'Bearer token-1'}
+    assert fetch_radar_token(*args, cache_path=cache_path) == {'Authorization': 'Bearer token-1'}
+    assert session.tokens == 1
+    assert cache_path.stat().st_mode & 0o777 == 0o600
+
+    # a new process reads the token from the cache file
+    monkeypatch.setattr(radar, '_tokens', {})
+    assert fetch_radar_token(*args, cache_path=cache_path) == {'Authorization': 'Bearer token-1'}
+    assert session.tokens == 1
+
+
+def test_fetch_radar_token_permissions(mock_radar, tmp_path):
+    mock_radar()
+    cache_path = tmp_path / 'tokens.json'
+    cache_path.write_text('{}')
+    cache_path.chmod(0o644)
+    args = (RADAR_URL, 'client', 'secret', 'https://example.org', 'user', 'password')
+
+    # an existing cache file is made private before the token is written
+    fetch_radar_token(*args, cache_path=cache_path)
+    assert cache_path.stat().st_mode & 0o777 == 0o600
+
+
+def test_with_radar_token(mock_radar, tmp_path, monkeypatch):
+    session = mock_radar()
+    cache_path = tmp_path / 'tokens.json'
+    args = (RADAR_URL, 'client', 'secret', 'https://example.org', 'user', 'password')
+    fetch_radar_token(*args, cache_path=cache_path)
+
+    def create(headers):
+        return create_radar_dataset(RADAR_URL, 'workspace', headers, {})
+
+    # the cached token was revoked, so a new one is fetched, in the process and in the cache file
+    session.revoked.add('token-1')
+    monkeypatch.setattr(radar, '_tokens', {})
+    assert with_radar_token(create, *args, cache_path=cache_path) == ('dataset', {'Authorization': 'Bearer token-2'})
+    assert session.tokens == 2
+    monkeypatch.setattr(radar, '_tokens', {})
+    assert fetch_radar_token(*args, cache_path=cache_path) == {'Authorization': 'Bearer token-2'}
+
+    # a new token is only fetched once
+    session.revoked.add('token-2')
+    session.revoked.add('token-3')
+    with pytest.raises(requests.exceptions.HTTPError):
+        with_radar_token(create, *args, cache_path=cache_path)
+    assert session.tokens == 3
+
+
+def test_fetch_radar_token_expired(mock_radar):
+    session = mock_radar(expires_in=30)
+    args = (RADAR_URL, 'client', 'secret', 'https://example.org', 'user', 'password')
+
+    assert fetch_radar_token(*args) == {'Authorization': 'Bearer token-1'}
+    assert fetch_radar_token(*args) == {'Authorization': 'Bearer token-2'}
+    assert session.tokens == 2
+
+
+def test_upload_radar_assets(mock_radar, tmp_path):
+    session = mock_radar(failures={'asset-1.txt': 2, 'asset-2.txt': 5})
+    assets = []
+    for i in range(4):
+        (tmp_path / f'asset-{i}.txt').write_text(f'asset {i}')
+        assets.append(f'https://example.org/asset-{i}.txt')
+
+    with pytest.raises(RuntimeError) as excinfo:
+        upload_radar_assets(RADAR_URL, '123', {}, assets, tmp_path, workers=2, retries=3)
+    assert str(excinfo.value) == 'Could not upload asset-2.txt to RADAR.'
+    assert sorted(session.files) == ['asset-0.txt', 'asset-1.txt', 'asset-3.txt']
+
+
+def test_upload_radar_assets_retries(mock_radar, tmp_path, capsys):
+    mock_radar(failures={'asset-0.txt': 2})
+    (tmp_path / 'asset-0.txt').write_text('asset 0')
+
+    # the response is only printed when the upload finally fails
+    upload_radar_assets(RADAR_URL, '123', {}, ['https://example.org/asset-0.txt'], tmp_path, retries=3)
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,91 @@
+import hashlib
+
+import pytest
+
+from facile_rs.utils.zenodo import upload_zenodo_assets
+
+ZENODO_URL = 'https://sandbox.zenodo.org'
+
+
+class MockZenodo:
+
+    """Handler for MockSession, which keeps the files and the registered entries of a Zenodo draft"""
+
+    def __init__(self, fail=(), entries=()):
+        self.files = {}
+        self.fail = fail
+        self.entries = list(entries)
+        self.registered = []
+
+    def __call__(self, method, url, **kwargs):
+        path = url.replace(ZENODO_URL, '')
+        if path.endswith('/content'):
+            key = path.split('/')[-2]
+            if key in self.fail:
+                return ({'message': 'error'}, 500)
+            self.files[key] = kwargs['data'].read()
+        elif path.endswith('/draft/files') and method == 'GET':
+            return {'entries': self.entries}
+        elif path.endswith('/draft/files') and method == 'POST':
+            self.registered = [entry['key'] for entry in kwargs['json']]
+        return {}
+
+
+def get_requests(session):
+    return [(method, url.replace(ZENODO_URL, '')) for method, url, kwargs in session.requests]
+
+
+@pytest.fixture
+def assets(tmp_path):
+    locations = []
+    for i in range(5):
+        asset = tmp_path / f'asset-{i}.txt'
+        asset.write_text(f'asset {i}')
+        locations.append(f'https://example.org/{asset.name}')
+    return locations
+
+
+def test_upload_zenodo_assets(mock_session, tmp_path, assets):
+    zenodo = MockZenodo()
+    session = mock_session(zenodo)
+    upload_zenodo_assets(ZENODO_URL, '123', 'token', assets, tmp_path, workers=3)
+
+    filenames = [location.split('/')[-1] for location in assets]
+    requests = get_requests(session)
+    assert requests[:2] == [('GET', '/api/records/123/draft/files'), ('POST', '/api/records/123/draft/files')]
+    assert zenodo.registered == filenames
+    assert zenodo.files == {filename: f'asset {i}'.encode() for i, filename in enumerate(filenames)}
+    for filename in filenames:
+        assert ('POST', f'/api/records/123/draft/files/{filename}/commit') in requests
+
+
+def test_upload_zenodo_assets_errors(mock_session, tmp_path, assets):
+    zenodo = MockZenodo(fail=['asset-1.txt', 'asset-3.txt'])
+    mock_session(zenodo)
+    with pytest.raises(RuntimeError) as excinfo:
+        upload_zenodo_assets(ZENODO_URL, '123', 'token', assets, tmp_path, workers=3)
+
+    assert str(excinfo.value) == 'Could not upload asset-1.txt, asset-3.txt to Zenodo.'
+    assert sorted(zenodo.files) == ['asset-0.txt', 'asset-2.txt', 'asset-4.txt']
+
+
+def test_upload_zenodo_assets_update(mock_session, tmp_path, assets):
+    zenodo = MockZenodo(entries=[
+        # unchanged
+        {'key': 'asset-0.txt', 'status': 'completed', 'checksum': 'md5:' + hashlib.md5(b'asset 0').hexdigest()},
+        # changed
+        {'key': 'asset-1.txt', 'status': 'completed', 'checksum': 'md5:' + hashlib.md5(b'old').hexdigest()},
+        # left pending by a previous run
+        {'key': 'asset-2.txt', 'status': 'pending'},
+        # stale
+        {'key': 'old-asset.txt', 'status': 'completed', 'checksum': 'md5:' + hashlib.md5(b'old').hexdigest()}
+    ])
+    session = mock_session(zenodo)
+    upload_zenodo_assets(ZENODO_URL, '123', 'token', assets, tmp_path, workers=3)
+
+    assert zenodo.registered == ['asset-1.txt', 'asset-3.txt', 'asset-4.txt']
+    assert sorted(zenodo.files) == ['asset-1.txt', 'asset-2.txt', 'asset-3.txt', 'asset-4.txt']
+    assert sorted(path for method, path in get_requests(session) if method == 'DELETE') == [
+        '/api/records/123/draft/files/asset-1.txt',
+        '/api/records/123/draft/files/old-asset.txt'
+    ]
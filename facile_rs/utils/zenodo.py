@@ -2,8 +2,14 @@ import logging
 
 import requests
 
+from .checksum import get_checksums
+from .concurrency import map_concurrently
+from .http import get_session, get_upload_timeout
+
 logger = logging.getLogger(__file__)
 
+UPLOAD_WORKERS = 4
+
 
 def create_zenodo_dataset(zenodo_url, zenodo_token, zenodo_dict):
     """
@@ -20,9 +26,9 @@ def create_zenodo_dataset(zenodo_url, zenodo_token, zenodo_dict):
         "Authorization": "Bearer " + zenodo_token
     }
     try:
-        response = requests.post(url,
-                                headers=headers,
-                                json=zenodo_dict)
+        response = get_session().post(url,
+                                      headers=headers,
+                                      json=zenodo_dict)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         return response.json()['id']
@@ -45,12 +51,12 @@ def prepare_zenodo_dataset(zenodo_url, dataset_id, zenodo_token):
         # Prereserve DOI
         headers = {"Authorization": "Bearer " + zenodo_token}
         reserve_doi_url = zenodo_url + f'/api/records/{dataset_id}/draft/pids/doi'
-        response = requests.post(reserve_doi_url, headers=headers)
+        response = get_session().post(reserve_doi_url, headers=headers)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         # Get Zenodo dataset
         dataset_url = zenodo_url + f'/api/records/{dataset_id}/draft'
-        response = requests.get(dataset_url, headers=headers)
+        response = get_session().get(dataset_url, headers=headers)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         return response.json()
@@ -75,7 +81,7 @@ def update_zenodo_dataset(zenodo_url, dataset_id, zenodo_token, zenodo_dict):
         "Authorization": "Bearer " + zenodo_token
     }
     try:
-        response = requests.put(url, headers=headers, json=zenodo_dict)
+        response = get_session().put(url, headers=headers, json=zenodo_dict)
         response.raise_for_status()
         logger.debug('response = %s', response.json())
         return response.json()['id']
@@ -84,54 +90,154 @@ def update_zenodo_dataset(zenodo_url, dataset_id, zenodo_token, zenodo_dict):
         raise e
 
 
-def upload_zenodo_assets(zenodo_url, dataset_id, zenodo_token, assets, path):
+def list_zenodo_files(zenodo_url, dataset_id, zenodo_token):
     """
-    Upload assets to a Zenodo dataset.
+    List the files of a Zenodo dataset draft.
 
     :param zenodo_url: URL to the Zenodo repository
     :param dataset_id: Zenodo dataset ID
     :param zenodo_token: Zenodo personal token
-    :param assets: locations of assets to upload
-    :type assets: list
-    :param path: location where the assets are collected before upload
+    :return: Zenodo file entries, by file key
+    :rtype: dict
+    """
+    headers = {
+        "Authorization": "Bearer " + zenodo_token
+    }
+    try:
+        response = get_session().get(zenodo_url + f'/api/records/{dataset_id}/draft/files', headers=headers)
+        response.raise_for_status()
+        logger.debug('response = %s', response.json())
+        return {entry['key']: entry for entry in response.json().get('entries', [])}
+    except requests.exceptions.HTTPError as e:
+        print(response.text)
+        raise e
+
+
+def delete_zenodo_file(zenodo_url, dataset_id, zenodo_token, filename):
+    """
+    Delete a file from a Zenodo dataset draft.
+
+    :param zenodo_url: URL to the Zenodo repository
+    :param dataset_id: Zenodo dataset ID
+    :param zenodo_token: Zenodo personal token
+    :param filename: key of the file in the Zenodo dataset
     """
     headers = {
         "Authorization": "Bearer " + zenodo_token
     }
+    try:
+        response = get_session().delete(zenodo_url + f'/api/records/{dataset_id}/draft/files/{filename}',
+                                        headers=headers)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        print(response.text)
+        raise e
 
-    for location in assets:
-        filename = location.split('/')[-1]
-        target = path / filename
 
-        # Start file upload
+def upload_zenodo_file(zenodo_url, dataset_id, zenodo_token, filename, target):
+    """
+    Upload the content of a file to a Zenodo dataset and commit it. The file needs to be registered
+    in the dataset beforehand.
+
+    :param zenodo_url: URL to the Zenodo repository
+    :param dataset_id: Zenodo dataset ID
+    :param zenodo_token: Zenodo personal token
+    :param filename: key of the file in the Zenodo dataset
+    :param target: path to the file to upload
+    """
+    headers = {
+        "Authorization": "Bearer " + zenodo_token
+    }
+
+    # Upload file content
+    with open(target, "rb") as fp:
         try:
-            response = requests.post(zenodo_url + f'/api/records/{dataset_id}/draft/files',
-                                    headers=headers,
-                                    json=[{'key': filename}])
+            response = get_session().put(zenodo_url + f'/api/records/{dataset_id}/draft/files/{filename}/content',
+                                         headers=headers,
+                                         data=fp,
+                                         timeout=get_upload_timeout())
             response.raise_for_status()
             logger.debug('response = %s', response.json())
         except requests.exceptions.HTTPError as e:
             print(response.text)
             raise e
 
-        # Upload file content
-        with open(target, "rb") as fp:
-            try:
-                response = requests.put(zenodo_url + f'/api/records/{dataset_id}/draft/files/{filename}/content',
-                                        headers=headers,
-                                        data=fp)
-                response.raise_for_status()
-                logger.debug('response = %s', response.json())
-            except requests.exceptions.HTTPError as e:
-                print(response.json())
-                raise e
-
-        # Complete file upload
+    # Complete file upload
+    try:
+        response = get_session().post(zenodo_url + f'/api/records/{dataset_id}/draft/files/{filename}/commit',
+                                      headers=headers)
+        response.raise_for_status()
+        logger.debug('response = %s', response.json())
+    except requests.exceptions.HTTPError as e:
+        print(response.text)
+        raise e
+
+
+def upload_zenodo_assets(zenodo_url, dataset_id, zenodo_token, assets, path, workers=None):
+    """
+    Upload assets to a Zenodo dataset.
+
+    Files which are already in the draft with the same MD5 checksum are not uploaded again, files of the draft
+    which are not in the assets anymore are deleted. Files left pending by a previous, failed upload are uploaded
+    again without registering them. All other files are registered in the dataset with one request,
+    then their content is uploaded concurrently.
+
+    :param zenodo_url: URL to the Zenodo repository
+    :param dataset_id: Zenodo dataset ID
+    :param zenodo_token: Zenodo personal token
+    :param assets: locations of assets to upload
+    :type assets: list
+    :param path: location where the assets are collected before upload
+    :param workers: maximum number of files uploaded at the same time (default: UPLOAD_WORKERS)
+    :type workers: int
+    """
+    workers = int(workers) if workers else UPLOAD_WORKERS
+
+    headers = {
+        "Authorization": "Bearer " + zenodo_token
+    }
+
+    filenames = list(dict.fromkeys(location.split('/')[-1] for location in assets))
+
+    # Compare the files of the draft with the assets
+    draft_files = list_zenodo_files(zenodo_url, dataset_id, zenodo_token)
+    existing = [filename for filename in filenames if filename in draft_files]
+    checksums = map_concurrently(lambda filename: get_checksums(path / filename, ['md5'])['md5'],
+                                 existing, workers, 'Could not compute the checksum of {}.')
+
+    unchanged, pending, deleted = [], [], []
+    for filename, checksum in zip(existing, checksums):
+        entry = draft_files[filename]
+        if entry.get('status') != 'completed':
+            pending.append(filename)
+        elif entry.get('checksum') == f'md5:{checksum}':
+            unchanged.append(filename)
+        else:
+            deleted.append(filename)
+    deleted += [filename for filename in draft_files if filename not in filenames]
+    registered = [filename for filename in filenames if filename not in draft_files or filename in deleted]
+
+    logger.info('%d unchanged, %d pending, %d deleted and %d new or changed files',
+                len(unchanged), len(pending), len(deleted), len(registered))
+
+    # Delete changed and stale files
+    map_concurrently(lambda filename: delete_zenodo_file(zenodo_url, dataset_id, zenodo_token, filename),
+                     deleted, workers, 'Could not delete {} from Zenodo.')
+
+    # Start file upload for all new or changed files
+    if registered:
         try:
-            response = requests.post(zenodo_url + f'/api/records/{dataset_id}/draft/files/{filename}/commit',
-                                    headers=headers)
+            response = get_session().post(zenodo_url + f'/api/records/{dataset_id}/draft/files',
+                                          headers=headers,
+                                          json=[{'key': filename} for filename in registered])
             response.raise_for_status()
             logger.debug('response = %s', response.json())
         except requests.exceptions.HTTPError as e:
             print(response.text)
             raise e
+
+    # Upload file content and complete file upload
+    uploaded = [filename for filename in filenames if filename not in unchanged]
+    map_concurrently(lambda filename: upload_zenodo_file(zenodo_url, dataset_id, zenodo_token,
+                                                         filename, path / filename),
+                     uploaded, workers, 'Could not upload {} to Zenodo.')